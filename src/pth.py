@@ -1,22 +1,76 @@
 from __future__ import print_function
 
+import binascii
+import codecs
 import errno
+import fnmatch
+import hashlib
+import json
+import mmap as mmapmod
 import os
 import posixpath
+import re
+import select
 import shutil
+import stat as statmod
+import struct
 import sys
 import tempfile
+import threading
 import time
+import types
+import weakref
 import zipfile
+import zlib
 import io
+from array import array
+from collections import OrderedDict
+from collections import namedtuple
 from os import path as ospath
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    ctypes = None
+
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+try:
+    from concurrent import futures
+except ImportError:
+    futures = None
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
 
 PY2 = sys.version_info[0] == 2
 PY3 = sys.version_info[0] == 3
 PY32 = sys.version_info[:2] >= (3, 2)
 PY33 = sys.version_info[:2] >= (3, 3)
 
+COPY_BUFFER_SIZE = 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
 if PY2:
     def exec_(_code_, _globs_=None, _locs_=None):
         """Execute code in a namespace."""
@@ -53,22 +107,928 @@ class PathDoesNotExist(PathError):
     pass
 
 
+def _stat(path):
+    entry = getattr(path, '_direntry', None)
+    if entry is not None:
+        return entry.stat()
+    cache = _stat_cache()
+    if cache is None:
+        return os.stat(path)
+    else:
+        return cache.stat(path)
+
+
+_stat_caches = threading.local()
+_clock = getattr(time, 'monotonic', time.time)
+
+
+def _stat_cache():
+    stack = getattr(_stat_caches, 'stack', None)
+    return stack[-1] if stack else None
+
+
+def _invalidate_stat(*paths):
+    for cache in getattr(_stat_caches, 'stack', ()):
+        if paths:
+            for path in paths:
+                cache.invalidate(path)
+        else:
+            cache.invalidate()
+
+
+def _invalidate_stat_tree(*paths):
+    # for renamed or removed directories: whatever was cached under them is stale too
+    for cache in getattr(_stat_caches, 'stack', ()):
+        for path in paths:
+            cache.invalidate(path, recursive=True)
+
+
+class StatCache(object):
+    """
+    Bounded LRU cache of ``os.stat`` results (failures included). Use it as a context manager (``with
+    pth.stat_cache(ttl=...):``) and ``exists``, ``isdir``, ``isfile``, ``size``, ``atime``, ``ctime`` and ``mtime`` will
+    share one ``stat`` per path for the duration of the ``with`` block (or for `ttl` seconds).
+
+    Entries are invalidated by the mutating :class:`Path` methods (``chmod``, ``rename``, ``unlink``, ``utime``,
+    ``truncate`` etc) and by changing the working directory with :attr:`Path.cd`. Changes done behind *pth*'s back
+    are not noticed, use :meth:`invalidate` or a `ttl`.
+
+    The cache is active only in the thread that entered it.
+    """
+
+    def __init__(self, ttl=None, maxsize=65536):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.__results = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__results)
+
+    def stat(self, path):
+        key = string(path)
+        now = _clock()
+        with self.__lock:
+            try:
+                timestamp, result = self.__results.pop(key)
+            except KeyError:
+                result = None
+            else:
+                if self.ttl is None or now - timestamp < self.ttl:
+                    self.__results[key] = timestamp, result
+                else:
+                    result = None
+        if result is None:
+            try:
+                result = os.stat(path)
+            except OSError as exc:
+                result = exc
+            with self.__lock:
+                self.__results[key] = now, result
+                while len(self.__results) > self.maxsize:
+                    self.__results.popitem(last=False)
+        if isinstance(result, OSError):
+            raise OSError(result.errno, result.strerror, result.filename)
+        return result
+
+    def exists(self, path):
+        try:
+            self.stat(path)
+        except OSError:
+            return False
+        return True
+
+    def isdir(self, path):
+        try:
+            return statmod.S_ISDIR(self.stat(path).st_mode)
+        except OSError:
+            return False
+
+    def isfile(self, path):
+        try:
+            return statmod.S_ISREG(self.stat(path).st_mode)
+        except OSError:
+            return False
+
+    def invalidate(self, path=None, recursive=False):
+        """
+        Forget the result for `path` (and everything under it if `recursive`) or everything if `path` is not given.
+        """
+        with self.__lock:
+            if path is None:
+                self.__results.clear()
+            else:
+                self.__results.pop(string(path), None)
+                if recursive:
+                    prefix = ospath.join(ospath.abspath(path), '')
+                    for key in [key for key in self.__results if ospath.abspath(key).startswith(prefix)]:
+                        del self.__results[key]
+    clear = invalidate
+
+    def __enter__(self):
+        stack = getattr(_stat_caches, 'stack', None)
+        if stack is None:
+            stack = _stat_caches.stack = []
+        stack.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _stat_caches.stack.remove(self)
+
+
+class StatArrays(object):
+    """
+    Columnar result of :func:`stat_many`: ``size``, ``mtime``, ``mode`` and ``inode`` are arrays with one item per
+    path, in the order of ``paths``. Paths that couldn't be stat'ed have a ``1`` in the ``missing`` mask, the error
+    number in ``errno`` and zeroes in the other columns.
+    """
+
+    def __init__(self, paths):
+        count = len(paths)
+        self.paths = paths
+        self.size = array('q' if PY33 else 'l', [0]) * count
+        self.mtime = array('d', [0]) * count
+        self.mode = array('L', [0]) * count
+        self.inode = array('Q' if PY33 else 'L', [0]) * count
+        self.missing = array('b', [0]) * count
+        self.errno = array('i', [0]) * count
+
+    def __len__(self):
+        return len(self.paths)
+
+    def fill(self, start, stop, follow_symlinks=True):
+        stat = os.stat if follow_symlinks else os.lstat
+        paths = self.paths
+        for i in range(start, stop):
+            try:
+                st = stat(paths[i])
+            except OSError as exc:
+                self.missing[i] = 1
+                self.errno[i] = exc.errno or 0
+            else:
+                self.size[i] = st.st_size
+                self.mtime[i] = st.st_mtime
+                self.mode[i] = st.st_mode
+                self.inode[i] = st.st_ino
+
+
+def stat_many(paths, workers=None, follow_symlinks=True, chunksize=1024):
+    """
+    Stat all the `paths`, with `workers` threads if given. Failures don't raise, they are marked in the ``missing``
+    mask of the returned :class:`StatArrays`.
+    """
+    result = StatArrays(list(paths))
+    count = len(result)
+    if workers and futures is not None and count > chunksize:
+        with futures.ThreadPoolExecutor(workers) as executor:
+            for future in [executor.submit(result.fill, start, min(start + chunksize, count), follow_symlinks)
+                           for start in range(0, count, chunksize)]:
+                future.result()
+    else:
+        result.fill(0, count, follow_symlinks)
+    return result
+
+
+class HashCache(object):
+    """
+    LRU cache of file digests keyed on ``(st_dev, st_ino, st_size, st_mtime_ns)``, so unchanged files are not read
+    again. If a `path` is given the cache is loaded from it and :meth:`save` (or leaving the ``with`` block) writes
+    it back.
+    """
+
+    def __init__(self, path=None, maxsize=1000000):
+        self.path = path
+        self.maxsize = maxsize
+        self.__digests = OrderedDict()
+        self.__lock = threading.Lock()
+        if path is not None and ospath.exists(path):
+            with io.open(path, 'r', encoding='ascii') as fh:
+                self.__digests.update(json.load(fh))
+
+    def __len__(self):
+        return len(self.__digests)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.save()
+
+    @staticmethod
+    def key(st, algo):
+        return '%s:%s:%s:%s:%s' % (st.st_dev, st.st_ino, st.st_size, _mtime(st), algo)
+
+    def get(self, key):
+        with self.__lock:
+            digest = self.__digests.pop(key, None)
+            if digest is not None:
+                self.__digests[key] = digest
+            return digest
+
+    def set(self, key, digest):
+        with self.__lock:
+            self.__digests.pop(key, None)
+            self.__digests[key] = digest
+            while len(self.__digests) > self.maxsize:
+                self.__digests.popitem(last=False)
+
+    def save(self):
+        if self.path is None:
+            return
+        with self.__lock:
+            data = json.dumps(list(self.__digests.items()))
+        tmp = '%s.%s.tmp' % (self.path, os.getpid())
+        with io.open(tmp, 'w', encoding='ascii') as fh:
+            fh.write(data if PY3 else data.decode('ascii'))
+        if hasattr(os, 'replace'):
+            os.replace(tmp, self.path)
+        else:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            os.rename(tmp, self.path)
+
+
+def hash_many(paths, algo='sha256', workers=None, cache=None):
+    """
+    Hex digests of all the `paths`, in order, computed on `workers` threads. See :meth:`Path.hash`.
+    """
+    return _map(
+        lambda path: (path if isinstance(path, AbstractPath) else Path(path)).hash(algo, cache=cache),
+        list(paths), workers
+    )
+
+
+def _mtime_ns(st):
+    return getattr(st, 'st_mtime_ns', None) or int(st.st_mtime * 1000000000)
+
+
+def _array_bytes(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes() if hasattr(values, 'tobytes') else values.tostring()
+
+
+def _array_load(typecode, data):
+    values = array(typecode)
+    (values.frombytes if hasattr(values, 'frombytes') else values.fromstring)(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+class SnapshotDiff(namedtuple('SnapshotDiff', 'added removed modified renamed')):
+    """
+    Result of :meth:`Snapshot.diff`: sets of relative paths, `renamed` has ``(old, new)`` pairs.
+    """
+    __slots__ = ()
+
+
+class _DigestColumn(object):
+    # the binary digests of a snapshot back to back, all zeros for no digest; hex digests are only made on access
+    def __init__(self, size, data=b''):
+        self.size = size
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // self.size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('digest index out of range')
+        digest = self.data[i * self.size:(i + 1) * self.size]
+        if digest.count(b'\0') == self.size:
+            return None
+        return binascii.hexlify(digest).decode('ascii')
+
+    def __setitem__(self, i, digest):
+        if not isinstance(self.data, bytearray):
+            self.data = bytearray(self.data)
+        self.data[i * self.size:(i + 1) * self.size] = self.encode(digest)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other):
+        if isinstance(other, _DigestColumn):
+            return self.size == other.size and self.data == other.data
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def encode(self, digest):
+        return b'\0' * self.size if digest is None else binascii.unhexlify(digest)
+
+    def append(self, digest):
+        if not isinstance(self.data, bytearray):
+            self.data = bytearray(self.data)
+        self.data += self.encode(digest)
+
+
+class Snapshot(object):
+    """
+    Columnar index of a directory tree, see :meth:`Path.snapshot`. ``paths`` are relative to ``root`` (with ``/`` as
+    separator) and sorted, ``isdir``, ``size``, ``mtime_ns`` and ``inode`` are arrays with one item per path and
+    ``hashes`` a sequence of hex digests (``None`` for anything but regular files), if an `algo` was used. The
+    digests are kept as one binary column and converted to hex on access.
+    """
+    MAGIC = b'PTHSNAP1'
+    header = struct.Struct('<8sQIHq')
+
+    def __init__(self, root, algo=None, root_mtime_ns=0):
+        self.root = root
+        self.algo = algo
+        self.root_mtime_ns = root_mtime_ns
+        self.paths = []
+        self.isdir = array('b')
+        self.size = array('q' if PY33 else 'l')
+        self.mtime_ns = array('q' if PY33 else 'l')
+        self.inode = array('Q' if PY33 else 'L')
+        self.hashes = _DigestColumn(hashlib.new(algo).digest_size) if algo else None
+        self.__index = None
+
+    def __repr__(self):
+        return 'pth.Snapshot(%r, %s entries)' % (self.root, len(self))
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, path):
+        return path in self.index()
+
+    def __getitem__(self, path):
+        i = self.index()[path]
+        return (
+            bool(self.isdir[i]), self.size[i], self.mtime_ns[i], self.inode[i], self.hashes and self.hashes[i]
+        )
+
+    def index(self):
+        """
+        Mapping of relative path to position in the columns.
+        """
+        if self.__index is None:
+            self.__index = dict((path, i) for i, path in enumerate(self.paths))
+        return self.__index
+
+    def listings(self):
+        """
+        Mapping of relative directory path (``''`` for the root) to the names in it.
+        """
+        listings = dict((path, []) for i, path in enumerate(self.paths) if self.isdir[i])
+        listings[''] = []
+        for path in self.paths:
+            parent, _, name = path.rpartition('/')
+            listings[parent].append(name)
+        return listings
+
+    def diff(self, other):
+        """
+        What changed from this snapshot to `other` (a newer :class:`Snapshot` of the same tree). Files are modified
+        if their size or mtime changed - or, if both snapshots have hashes from the same algorithm, their digest.
+        Renames are paths removed and added with the same inode, type, size and mtime.
+        """
+        old, new = self.index(), other.index()
+        compare_hashes = self.algo is not None and self.algo == other.algo
+        added = set(path for path in other.paths if path not in old)
+        removed = set(path for path in self.paths if path not in new)
+        modified = set()
+        for path, j in new.items():
+            i = old.get(path)
+            if i is None:
+                continue
+            if self.isdir[i] != other.isdir[j]:
+                modified.add(path)
+            elif not other.isdir[j]:
+                if compare_hashes and self.hashes[i] is not None and other.hashes[j] is not None:
+                    changed = self.hashes[i] != other.hashes[j]
+                else:
+                    changed = self.size[i] != other.size[j] or self.mtime_ns[i] != other.mtime_ns[j]
+                if changed:
+                    modified.add(path)
+
+        def identity(snapshot, i):
+            if snapshot.isdir[i]:
+                return snapshot.inode[i], True
+            return snapshot.inode[i], False, snapshot.size[i], snapshot.mtime_ns[i]
+
+        gone = dict((identity(self, old[path]), path) for path in removed)
+        renamed = set()
+        for path in sorted(added):
+            src = gone.pop(identity(other, new[path]), None)
+            if src is not None:
+                renamed.add((src, path))
+        for src, dest in renamed:
+            added.discard(dest)
+            removed.discard(src)
+        return SnapshotDiff(added, removed, modified, renamed)
+
+    def save(self, path):
+        """
+        Writes the snapshot to `path` (atomically): a header followed by the raw columns, the ``\\0`` separated
+        paths and the binary digests.
+        """
+        encoding = sys.getfilesystemencoding()
+        root = _fsencode(self.root)
+        algo = (self.algo or '').encode('ascii')
+        names = '\0'.join(self.paths)
+        names = names.encode(encoding, 'surrogateescape') if PY3 else names
+        tmp = '%s.%s.tmp' % (path, os.getpid())
+        with io.open(tmp, 'wb') as fh:
+            fh.write(self.header.pack(self.MAGIC, len(self), len(root), len(algo), self.root_mtime_ns))
+            fh.write(root)
+            fh.write(algo)
+            for column in self.isdir, self.size, self.mtime_ns, self.inode:
+                fh.write(_array_bytes(column))
+            fh.write(struct.pack('<Q', len(names)))
+            fh.write(names)
+            if self.algo:
+                fh.write(self.hashes.data)
+        if hasattr(os, 'replace'):
+            os.replace(tmp, path)
+        else:
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a snapshot written by :meth:`save`.
+        """
+        with io.open(path, 'rb') as fh:
+            data = fh.read()
+        if not data.startswith(cls.MAGIC):
+            raise ValueError('%r is not a snapshot file.' % path)
+        _, count, root_length, algo_length, root_mtime_ns = cls.header.unpack_from(data)
+        offset = cls.header.size
+        root = _fsdecode(data[offset:offset + root_length])
+        offset += root_length
+        algo = data[offset:offset + algo_length].decode('ascii') or None
+        offset += algo_length
+        snapshot = cls(root, algo, root_mtime_ns)
+        # slices of a memoryview don't copy the (large) columns once more
+        view = memoryview(data) if PY3 else data
+        for name in 'isdir', 'size', 'mtime_ns', 'inode':
+            typecode = getattr(snapshot, name).typecode
+            length = count * array(typecode).itemsize
+            setattr(snapshot, name, _array_load(typecode, view[offset:offset + length]))
+            offset += length
+        names_length, = struct.unpack_from('<Q', data, offset)
+        offset += 8
+        names = view[offset:offset + names_length]
+        offset += names_length
+        if PY3:
+            names = str(names, sys.getfilesystemencoding(), 'surrogateescape')
+        snapshot.paths = names.split('\0') if count else []
+        if algo:
+            size = snapshot.hashes.size
+            snapshot.hashes.data = data[offset:offset + count * size]
+        return snapshot
+
+
+class _StatEntry(object):
+    # minimal ``os.DirEntry`` lookalike for when scandir is not available
+    def __init__(self, top, name):
+        self.name = name
+        self.path = ospath.join(top, name)
+        self.__lstat = os.lstat(self.path)
+
+    def stat(self, follow_symlinks=True):
+        if follow_symlinks and self.is_symlink():
+            return os.stat(self.path)
+        return self.__lstat
+
+    def inode(self):
+        return self.__lstat.st_ino
+
+    def is_symlink(self):
+        return statmod.S_ISLNK(self.__lstat.st_mode)
+
+    def is_dir(self, follow_symlinks=True):
+        try:
+            return statmod.S_ISDIR(self.stat(follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+    def is_file(self, follow_symlinks=True):
+        try:
+            return statmod.S_ISREG(self.stat(follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+
+def _scandir(top):
+    if scandir is None:
+        return [_StatEntry(top, name) for name in os.listdir(top)]
+    entries = scandir(top)
+    try:
+        return list(entries)
+    finally:
+        if hasattr(entries, 'close'):
+            entries.close()
+
+
+def _walk_entries(top, prune=None, max_depth=None, depth=0):
+    """
+    Yields ``(depth, entry)`` for everything under `top`, without following symlinks. Directories are descended
+    after being yielded, unless ``prune(entry)`` is true or `max_depth` is reached.
+    """
+    for entry in _scandir(top):
+        yield depth, entry
+        if (
+            (max_depth is None or depth < max_depth) and entry.is_dir(follow_symlinks=False) and
+            not (prune and prune(entry))
+        ):
+            for item in _walk_entries(entry.path, prune, max_depth, depth + 1):
+                yield item
+
+
+def find_duplicates(roots, workers=None, algo='sha256', block_size=64 * 1024, min_size=1):
+    """
+    Find files with identical contents under the `roots` (a path or a list of paths). Returns a list of groups,
+    each a sorted list of :class:`Path` objects.
+
+    Files are first bucketed by size, then by a digest of their first and last `block_size` bytes and only then by a
+    full digest, so only the files that still collide are read in full (on `workers` threads). Hardlinks (same
+    device and inode) are read only once and don't form a group by themselves.
+    """
+    if isinstance(roots, string):
+        roots = [roots]
+    by_size = {}
+    for root in roots:
+        for _, entry in _walk_entries(root):
+            if entry.is_file(follow_symlinks=False):
+                st = entry.stat(follow_symlinks=False)
+                if st.st_size >= min_size:
+                    by_size.setdefault(st.st_size, {}).setdefault((st.st_dev, st.st_ino), []).append(entry.path)
+
+    # groups of hardlinked paths (one item per inode) that could be duplicates
+    candidates = [(size, links) for size, inodes in by_size.items() if len(inodes) > 1 for links in inodes.values()]
+
+    def digest(args, partial):
+        size, links = args
+        hasher = hashlib.new(algo)
+        with io.open(links[0], 'rb') as fh:
+            if partial and size > 2 * block_size:
+                hasher.update(fh.read(block_size))
+                fh.seek(-block_size, os.SEEK_END)
+                hasher.update(fh.read(block_size))
+            else:
+                for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def bucket(items, partial):
+        buckets = {}
+        for item, key in zip(items, _map(lambda item: digest(item, partial), items, workers)):
+            buckets.setdefault((item[0], key), []).append(item)
+        return [items for items in buckets.values() if len(items) > 1]
+
+    groups, large = [], []
+    for items in bucket(candidates, True):
+        if items[0][0] > 2 * block_size:
+            large.extend(items)
+        else:  # the partial digest covered the whole file
+            groups.append(items)
+    groups.extend(bucket(large, False))
+    return sorted(sorted(Path(path) for _, links in items for path in links) for items in groups)
+
+
+def _stat_key(st):
+    return st.st_dev, st.st_ino, getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size
+
+
+class ZipCheckCache(object):
+    """
+    Bounded LRU cache for :func:`zipfile.is_zipfile` results, keyed on ``(st_dev, st_ino, st_mtime, st_size)`` so a
+    modified or replaced archive is checked again.
+
+    With ``skip_obvious`` enabled missing paths, directories, other non-regular files and files too small to hold an
+    end of central directory record are rejected from the ``stat`` alone, without opening them.
+    """
+    # size of the smallest possible archive (an empty end of central directory record)
+    min_size = 22
+
+    def __init__(self, maxsize=4096, skip_obvious=True):
+        self.maxsize = maxsize
+        self.skip_obvious = skip_obvious
+        self.__results = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__results)
+
+    def __call__(self, path, st=None):
+        if st is None:
+            try:
+                st = _stat(path)
+            except (OSError, ValueError):
+                return False if self.skip_obvious else zipfile.is_zipfile(path)
+        if self.skip_obvious and (not statmod.S_ISREG(st.st_mode) or st.st_size < self.min_size):
+            return False
+
+        key = _stat_key(st)
+        with self.__lock:
+            try:
+                result = self.__results.pop(key)
+            except KeyError:
+                pass
+            else:
+                self.__results[key] = result
+                return result
+
+        result = zipfile.is_zipfile(path)
+        if self.maxsize:
+            with self.__lock:
+                self.__results[key] = result
+                while len(self.__results) > self.maxsize:
+                    self.__results.popitem(last=False)
+        return result
+
+    def invalidate(self, path=None):
+        """
+        Forget the cached result for `path` or everything if `path` is not given.
+        """
+        if path is None:
+            with self.__lock:
+                self.__results.clear()
+        else:
+            try:
+                key = _stat_key(os.stat(path))
+            except (OSError, ValueError):
+                return
+            with self.__lock:
+                self.__results.pop(key, None)
+    clear = invalidate
+
+
+zipcache = ZipCheckCache()
+
+
+class ZipFilePool(object):
+    """
+    Process-wide pool of open ``ZipFile`` objects, keyed on the archive's ``(st_dev, st_ino, st_mtime, st_size)``
+    so all the :class:`ZipPath` objects of an archive share one file descriptor and one parsed central directory.
+
+    Handles are reference counted by the :class:`ZipPath` objects using them. When more than `maxsize` archives are
+    open the least recently used idle handles are closed; handles still in use are never closed.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.__handles = OrderedDict()
+        self.__refs = {}
+        self.__watchers = {}
+        self.__lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.__handles)
+
+    def acquire(self, path):
+        key = _stat_key(_stat(path))
+        with self.__lock:
+            try:
+                zipobj = self.__handles.pop(key)
+            except KeyError:
+                zipobj = zipfile.ZipFile(path)
+                self.__refs[id(zipobj)] = 0
+            self.__handles[key] = zipobj
+            self.__refs[id(zipobj)] += 1
+            self.__evict()
+        return zipobj
+
+    def retain(self, zipobj):
+        """
+        Take another reference on `zipobj`. Returns ``False`` if it's not handled by the pool.
+        """
+        with self.__lock:
+            if id(zipobj) not in self.__refs:
+                return False
+            self.__refs[id(zipobj)] += 1
+            return True
+
+    def release(self, zipobj):
+        with self.__lock:
+            if id(zipobj) in self.__refs:
+                self.__refs[id(zipobj)] -= 1
+                self.__evict()
+
+    def watch(self, obj, zipobj):
+        """
+        Release a reference on `zipobj` when `obj` is garbage collected. Returns ``False`` if `obj` doesn't support
+        weak references (``str`` subclasses on Python 2), the caller must then release the reference itself.
+        """
+        def callback(ref):
+            self.__watchers.pop(id(ref), None)
+            self.release(zipobj)
+        try:
+            ref = weakref.ref(obj, callback)
+        except TypeError:
+            return False
+        self.__watchers[id(ref)] = ref
+        return True
+
+    def __evict(self, maxsize=None):
+        maxsize = self.maxsize if maxsize is None else maxsize
+        excess = len(self.__handles) - maxsize
+        for key, zipobj in list(self.__handles.items()):
+            if excess <= 0:
+                break
+            if not self.__refs[id(zipobj)]:
+                del self.__handles[key]
+                del self.__refs[id(zipobj)]
+                zipobj.close()
+                excess -= 1
+
+    def close(self):
+        """
+        Close all the idle handles.
+        """
+        with self.__lock:
+            self.__evict(0)
+
+
+zippool = ZipFilePool()
+
+
+def _expand_braces(pattern):
+    match = re.search(r'\{([^{}]*)\}', pattern)
+    if match is None:
+        return [pattern]
+    return [
+        expanded
+        for choice in match.group(1).split(',')
+        for expanded in _expand_braces(pattern[:match.start()] + choice + pattern[match.end():])
+    ]
+
+
+class GlobPattern(object):
+    """
+    A compiled glob pattern: ``*``, ``?``, ``[...]`` (as in ``fnmatch``), ``**`` (any number of directories) and
+    ``{a,b}`` alternatives. Patterns are relative and always use ``/`` as separator.
+
+    Matching walks only the directories that can match: literal segments are checked directly (one ``stat``) instead
+    of listing their parent and ``**`` doesn't follow symlinks. Like the :mod:`glob` module, wildcards don't match
+    names starting with a dot unless the pattern segment does.
+    """
+    RECURSIVE = object()
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        flags = re.IGNORECASE if ospath.normcase('A') == 'a' else 0
+        self.alternatives = []
+        for alternative in _expand_braces(pattern.replace(ospath.sep, '/')):
+            segments = []
+            for segment in alternative.split('/'):
+                if not segment or segment == '.':
+                    continue
+                if segment == '**':
+                    if not segments or segments[-1] is not self.RECURSIVE:
+                        segments.append(self.RECURSIVE)
+                elif not re.search(r'[*?[]', segment):
+                    segments.append(segment)
+                else:
+                    segments.append((segment.startswith('.'), re.compile(fnmatch.translate(segment), flags).match))
+            if segments:
+                self.alternatives.append(segments)
+
+    def __repr__(self):
+        return 'pth.GlobPattern(%r)' % self.pattern
+
+    def walk(self, top, scan, kind, join):
+        """
+        Yields ``(path, payload)`` for every match under `top`. `scan(path)` must return ``(name, is_dir,
+        is_symlink, payload)`` tuples for the children of a directory, `kind(path)` must return ``None`` for missing
+        paths, ``True`` for directories and ``False`` for anything else.
+        """
+        # a single alternative with at most one ``**`` matches every path in exactly one way: no need to remember them
+        if len(self.alternatives) == 1 and self.alternatives[0].count(self.RECURSIVE) <= 1:
+            for match in self.__walk(top, self.alternatives[0], 0, scan, kind, join):
+                yield match
+            return
+        seen = set()
+        for segments in self.alternatives:
+            for path, payload in self.__walk(top, segments, 0, scan, kind, join):
+                if path not in seen:
+                    seen.add(path)
+                    yield path, payload
+
+    def __walk(self, top, segments, i, scan, kind, join):
+        segment = segments[i]
+        last = i == len(segments) - 1
+        if segment is self.RECURSIVE:
+            if not last:
+                for match in self.__walk(top, segments, i + 1, scan, kind, join):
+                    yield match
+            for name, is_dir, is_symlink, payload in scan(top):
+                if name.startswith('.'):
+                    continue
+                path = join(top, name)
+                if last:
+                    yield path, payload
+                if is_dir and not is_symlink:
+                    for match in self.__walk(path, segments, i, scan, kind, join):
+                        yield match
+        elif isinstance(segment, string):
+            path = join(top, segment)
+            found = kind(path)
+            if found is not None:
+                if last:
+                    yield path, None
+                elif found:
+                    for match in self.__walk(path, segments, i + 1, scan, kind, join):
+                        yield match
+        else:
+            dotted, match = segment
+            for name, is_dir, _, payload in scan(top):
+                if (dotted or not name.startswith('.')) and match(name):
+                    path = join(top, name)
+                    if last:
+                        yield path, payload
+                    elif is_dir:
+                        for item in self.__walk(path, segments, i + 1, scan, kind, join):
+                            yield item
+
+
+if contextvars is not None:
+    _local_dirs = contextvars.ContextVar('pth.local_dirs', default=())
+
+    def _get_local_dirs():
+        return _local_dirs.get()
+
+    def _set_local_dirs(stack):
+        _local_dirs.set(stack)
+else:
+    _local_dirs = threading.local()
+
+    def _get_local_dirs():
+        return getattr(_local_dirs, 'stack', ())
+
+    def _set_local_dirs(stack):
+        _local_dirs.stack = stack
+
+
+def _getcwd():
+    stack = _get_local_dirs()
+    return stack[-1][0] if stack else os.getcwd()
+
+
+def _abspath(path):
+    stack = _get_local_dirs()
+    return ospath.normpath(ospath.join(stack[-1][0], path)) if stack else ospath.abspath(path)
+
+
+def _target(path, base=None):
+    # the path to do I/O with: a relative path made in a local working directory (or given to a method of a path made
+    # in one, `base`) is joined to that directory
+    base = getattr(path, '_base', None) or base
+    if base is None or ospath.isabs(path):
+        return path
+    return Path(ospath.normpath(ospath.join(base, path)))
+
+
+def _make_path(path, base=None):
+    # `base` is the local working directory a relative `path` is made in - the string is kept as is (lexical
+    # derivations like ``name`` or ``parts`` are unaffected), the base is only used to reach the file
+    if base is not None and not ospath.isabs(path):
+        local = Path(path)
+        local._base = base
+        return ZipPath(local) if zipcache(_target(local)) else local
+    return ZipPath(Path(path)) if zipcache(path) else Path(path)
+
+
 class PTH(object):
 
     @property
     def cwd(self):
-        return pth(os.getcwd())
+        return pth(_getcwd())
+
+    @property
+    def cwd_handle(self):
+        """
+        The :class:`DirHandle` of the innermost local working directory entered with ``opendir=True``, if any.
+        """
+        stack = _get_local_dirs()
+        return stack[-1][1] if stack else None
 
     def __call__(self, *parts):
         if parts:
             path = ospath.join(*parts)
         else:
             path = ospath.curdir
-
-        if zipfile.is_zipfile(path):
-            return ZipPath(Path(path), zipfile.ZipFile(path))
-        else:
-            return Path(path)
+        # a path made in a local working directory stays relative to it, even outside the ``with`` block
+        base = getattr(parts[0], '_base', None) if parts else None
+        if base is None:
+            stack = _get_local_dirs()
+            base = stack[-1][0] if stack else None
+        return _make_path(path, base)
 
 pth = PTH()
 
@@ -76,18 +1036,29 @@ string = str  # flake8: noqa
 
 
 class AbstractPath(string):
+    # local working directory a relative path was made in, see :class:`LocalWorkingDir`
+    _base = None
 
     def __repr__(self):
         return 'pth.Path(%r)' % string(self)
 
+    def _derive(self, *parts):
+        if self._base is None:
+            return pth(*parts)
+        return _make_path(ospath.join(*parts) if parts else ospath.curdir, self._base)
+
+    @property
+    def a(self):
+        return AsyncPath(self, aio)
+
     @property
     def basename(self):
-        return pth(ospath.basename(self))
+        return self._derive(ospath.basename(self))
     name = basename
 
     @property
     def dirname(self):
-        return pth(ospath.dirname(self))
+        return self._derive(ospath.dirname(self))
     dir = dirname
 
     @property
@@ -97,7 +1068,7 @@ class AbstractPath(string):
     @property
     def splitpath(self):
         first, second = ospath.split(self)
-        return pth(first), pth(second)
+        return self._derive(first), self._derive(second)
     pathsplit = splitpath
 
     @property
@@ -126,12 +1097,12 @@ class AbstractPath(string):
 
     @property
     def parts(self):
-        return [pth(part or ospath.sep) for part in self.split(ospath.sep)]
+        return [self._derive(part or ospath.sep) for part in self.split(ospath.sep)]
 
     @property
     def parents(self):
         parts = self.parts
-        return [pth(*parts[:-i]) for i in range(1, len(parts))]
+        return [self._derive(*parts[:-i]) for i in range(1, len(parts))]
 
     def __eq__(self, other):
         if isinstance(other, string):
@@ -139,6 +1110,9 @@ class AbstractPath(string):
         else:
             raise NotImplementedError
 
+    # defining __eq__ removes the inherited __hash__ on Python 3
+    __hash__ = string.__hash__
+
 
 class cached_property(object):
     """ A property that is only computed once per instance and then replaces
@@ -225,6 +1199,10 @@ class LazyObjectProxy(object):
     del name, op
 
     # Oddball signatures
+    def __next__(self):
+        return next(self.__lop_subject__)
+    next = __next__
+
     def __index__(self):
         return self.__lop_subject__.__index__()
 
@@ -245,131 +1223,185 @@ class LazyObjectProxy(object):
 class Path(AbstractPath):
     # TODO: add xattr (py3.3). Should be a dict-like object
 
+    # set on paths yielded by `list` and `tree`: type checks are answered from the directory entry
+    _direntry = None
+
+    def _invalidate(self, *others):
+        # the directory entry describes the path as it was listed, drop it once this path is changed
+        self._direntry = None
+        _invalidate_stat(_target(self), *[_target(other, self._base) for other in others])
+
     @property
     def abspath(self):
-        return pth(ospath.abspath(self))
+        return self._derive(_abspath(_target(self)))
     abs = abspath
 
     @property
     def exists(self):
-        return ospath.exists(self)
+        cache = _stat_cache()
+        if cache is None:
+            return ospath.exists(_target(self))
+        else:
+            return cache.exists(_target(self))
 
     @property
     def lexists(self):
-        return ospath.lexists(self)
+        return ospath.lexists(_target(self))
 
     @property
     def expanduser(self):
-        return pth(ospath.expanduser(self))
+        return self._derive(ospath.expanduser(self))
 
     @property
     def expandvars(self):
-        return pth(ospath.expandvars(self))
+        return self._derive(ospath.expandvars(self))
 
     @property
     def atime(self):
-        return ospath.getatime(self)
+        cache = _stat_cache()
+        if cache is None:
+            return ospath.getatime(_target(self))
+        else:
+            return cache.stat(_target(self)).st_atime
 
     @property
     def ctime(self):
-        return ospath.getctime(self)
+        cache = _stat_cache()
+        if cache is None:
+            return ospath.getctime(_target(self))
+        else:
+            return cache.stat(_target(self)).st_ctime
 
     @property
     def mtime(self):
-        return ospath.getmtime(self)
+        cache = _stat_cache()
+        if cache is None:
+            return ospath.getmtime(_target(self))
+        else:
+            return cache.stat(_target(self)).st_mtime
 
     @property
     def size(self):
-        return ospath.getsize(self)
+        cache = _stat_cache()
+        if cache is None:
+            return ospath.getsize(_target(self))
+        else:
+            return cache.stat(_target(self)).st_size
 
     @property
     def isdir(self):
-        return ospath.isdir(self)
+        if self._direntry is None:
+            cache = _stat_cache()
+            if cache is None:
+                return ospath.isdir(_target(self))
+            else:
+                return cache.isdir(_target(self))
+        try:
+            return self._direntry.is_dir()
+        except OSError:
+            return False
 
     @property
     def isfile(self):
-        return ospath.isfile(self)
+        if self._direntry is None:
+            cache = _stat_cache()
+            if cache is None:
+                return ospath.isfile(_target(self))
+            else:
+                return cache.isfile(_target(self))
+        try:
+            return self._direntry.is_file()
+        except OSError:
+            return False
 
     @property
     def islink(self):
-        return ospath.islink(self)
+        if self._direntry is None:
+            return ospath.islink(_target(self))
+        try:
+            return self._direntry.is_symlink()
+        except OSError:
+            return False
 
     @property
     def ismount(self):
-        return ospath.ismount(self)
+        return ospath.ismount(_target(self))
 
     def joinpath(self, *args):
-        return pth(ospath.join(self, *args))
+        return self._derive(self, *args)
     pathjoin = __div__ = __floordiv__ = __truediv__ = joinpath
 
     @property
     def normcase(self):
-        return pth(ospath.normcase(self))
+        return self._derive(ospath.normcase(self))
 
     @property
     def normpath(self):
-        return pth(ospath.normpath(self))
+        return self._derive(ospath.normpath(self))
 
     @property
     def norm(self):
-        return pth(ospath.normcase(ospath.normpath(self)))
+        return self._derive(ospath.normcase(ospath.normpath(self)))
 
     @property
     def realpath(self):
-        return pth(ospath.realpath(self))
+        return self._derive(ospath.realpath(_target(self)))
     real = realpath
 
     def relpath(self, start):
-        return pth(ospath.relpath(self, start))
+        return self._derive(ospath.relpath(_target(self), _target(start, self._base)))
     rel = relpath
 
     def samefile(self, other):
-        return ospath.samefile(self, other)
+        return ospath.samefile(_target(self), _target(other, self._base))
     same = samefile
 
     if hasattr(os, 'link'):
         if PY33:
             def link(self, dest, follow_symlinks=True, **kwargs):
-                os.link(self, dest, follow_symlinks=follow_symlinks, **kwargs)
+                os.link(_target(self), _target(dest, self._base), follow_symlinks=follow_symlinks, **kwargs)
         else:
             def link(self, dest):
-                os.link(self, dest)
+                os.link(_target(self), _target(dest, self._base))
 
     if PY33:
         @property
         def stat(self):
-            return LazyObjectProxy(lambda **kwargs: os.stat(self, **kwargs))
+            return LazyObjectProxy(lambda **kwargs: os.stat(_target(self), **kwargs))
 
         @property
         def lstat(self):
-            return LazyObjectProxy(lambda **kwargs: os.lstat(self, **kwargs))
+            return LazyObjectProxy(lambda **kwargs: os.lstat(_target(self), **kwargs))
     else:
         @property
         def stat(self):
-            return os.stat(self)
+            return os.stat(_target(self))
 
         @property
         def lstat(self):
-            return os.lstat(self)
+            return os.lstat(_target(self))
 
     @property
     def isreadable(self):
-        return LazyObjectProxy(lambda **kwargs: os.access(self, os.R_OK, **kwargs))
+        return LazyObjectProxy(lambda **kwargs: os.access(_target(self), os.R_OK, **kwargs))
 
     def mkdir(self):
-        os.mkdir(self)
+        os.mkdir(_target(self))
+        self._invalidate()
 
     def makedirs(self):
-        os.makedirs(self)
+        os.makedirs(_target(self))
+        self._direntry = None
+        _invalidate_stat()
 
     if hasattr(os, 'pathconf'):
         def pathconf(self, name):
-            return os.pathconf(self, name)
+            return os.pathconf(_target(self), name)
 
     if hasattr(os, 'readlink'):
         @property
         def readlink(self):
-            return os.readlink(self)
+            return os.readlink(_target(self))
 
     if hasattr(os, 'fsencode'):
         @property
@@ -378,111 +1410,133 @@ class Path(AbstractPath):
         fsencode = fsencoded
 
     def access(self, mode, **kwargs):
-        return os.access(self, mode, **kwargs)
+        return os.access(_target(self), mode, **kwargs)
 
     if PY33:
         @property
         def isreadable(self):
-            return LazyObjectProxy(lambda **kwargs: os.access(self, os.R_OK, **kwargs))
+            return LazyObjectProxy(lambda **kwargs: os.access(_target(self), os.R_OK, **kwargs))
 
         @property
         def iswritable(self):
-            return LazyObjectProxy(lambda **kwargs: os.access(self, os.W_OK, **kwargs))
+            return LazyObjectProxy(lambda **kwargs: os.access(_target(self), os.W_OK, **kwargs))
 
         @property
         def isexecutable(self):
-            return LazyObjectProxy(lambda **kwargs: os.access(self, os.R_OK | os.X_OK, **kwargs))
+            return LazyObjectProxy(lambda **kwargs: os.access(_target(self), os.R_OK | os.X_OK, **kwargs))
     else:
         @property
         def isreadable(self):
-            return os.access(self, os.R_OK)
+            return os.access(_target(self), os.R_OK)
 
         @property
         def iswritable(self):
-            return os.access(self, os.W_OK)
+            return os.access(_target(self), os.W_OK)
 
         @property
         def isexecutable(self):
-            return os.access(self, os.R_OK | os.X_OK)
+            return os.access(_target(self), os.R_OK | os.X_OK)
 
     if hasattr(os, 'chroot'):
         def chroot(self):
-            os.chroot(self)
+            os.chroot(_target(self))
 
     if hasattr(os, 'chflags'):
         def chflags(self, flags, follow_symlinks=True):
             if follow_symlinks:
-                os.chflags(self, flags)
+                os.chflags(_target(self), flags)
             else:
-                os.lchflags(self, flags)
+                os.lchflags(_target(self), flags)
 
         def lchflags(self, flags):
-            os.lchflags(self, flags)
+            os.lchflags(_target(self), flags)
 
     def unlink(self, **kwargs):
-        os.remove(self, **kwargs)
+        os.remove(_target(self), **kwargs)
+        self._invalidate()
     remove = unlink
 
     def removedirs(self):
-        os.removedirs(self)
+        os.removedirs(_target(self))
+        self._direntry = None
+        _invalidate_stat()
 
     def rename(self, new, **kwargs):
-        os.rename(self, new, **kwargs)
+        new = _target(new, self._base)
+        os.rename(_target(self), new, **kwargs)
+        self._invalidate(new)
+        _invalidate_stat_tree(self, new)
         return Path(new)
 
     def renames(self, new):
-        os.renames(self, new)
+        new = _target(new, self._base)
+        os.renames(_target(self), new)
+        self._direntry = None
+        _invalidate_stat()
         return Path(new)
 
     def replace(self, new, **kwargs):
-        os.replace(self, new, **kwargs)
+        new = _target(new, self._base)
+        os.replace(_target(self), new, **kwargs)
+        self._invalidate(new)
+        _invalidate_stat_tree(self, new)
         return Path(new)
 
     def rmdir(self, **kwargs):
-        os.rmdir(self, **kwargs)
+        os.rmdir(_target(self), **kwargs)
+        self._invalidate()
+        _invalidate_stat_tree(self)
 
     @property
     def statvfs(self):
-        return os.statvfs(self)
+        return os.statvfs(_target(self))
 
     def symlink(self, link_name, target_is_directory=False, **kwargs):
-        os.symlink(self, link_name, target_is_directory=target_is_directory, **kwargs)
+        # `self` is the contents of the link, it's resolved relative to the link's directory and is kept as is
+        if PY33:
+            os.symlink(self, _target(link_name, self._base), target_is_directory=target_is_directory, **kwargs)
+        else:
+            os.symlink(self, _target(link_name, self._base))
 
     def truncate(self, length):
-        os.truncate(self, length)
+        os.truncate(_target(self), length)
+        self._invalidate()
 
     def utime(self, times=None, **kwargs):
-        os.utime(self, times=times, **kwargs)
+        os.utime(_target(self), times, **kwargs)
+        self._invalidate()
 
     @property
     def splitdrive(self):
         first, second = ospath.splitdrive(self)
-        return first, pth(second)
+        return first, self._derive(second)
     drivesplit = splitdrive
 
     @property
     def splitext(self):
         first, second = ospath.splitext(self)
-        return pth(first), second
+        return self._derive(first), second
     extsplit = splitext
 
     def chmod(self, mode, follow_symlinks=True, **kwargs):
         if follow_symlinks:
-            return os.chmod(self, mode, **kwargs)
+            os.chmod(_target(self), mode, **kwargs)
         else:
             if PY33:
-                os.chmod(self, mode, follow_symlinks=follow_symlinks, **kwargs)
+                os.chmod(_target(self), mode, follow_symlinks=follow_symlinks, **kwargs)
             else:
-                os.lchmod(self, mode, **kwargs)
+                os.lchmod(_target(self), mode, **kwargs)
+        self._invalidate()
 
     def chown(self, uid, gid, follow_symlinks=True, **kwargs):
         if follow_symlinks:
-            os.chown(self, uid, gid, **kwargs)
+            os.chown(_target(self), uid, gid, **kwargs)
         else:
             if PY33:
-                os.chown(self, uid, gid, follow_symlinks=follow_symlinks, **kwargs)
+                os.chown(_target(self), uid, gid, follow_symlinks=follow_symlinks, **kwargs)
             else:
-                os.lchown(self, uid, gid, **kwargs)
+                os.lchown(_target(self), uid, gid, **kwargs)
+        self._invalidate()
 
     def lchmod(self, mode):
         self.chmod(mode, follow_symlinks=False)
@@ -492,6 +1546,17 @@ class Path(AbstractPath):
 
     @property
     def tree(self):
+        return LazyObjectProxy(self.__tree)
+
+    def __tree(self, workers=None, order='depth-first', max_pending=None):
+        if order not in ('depth-first', 'unordered'):
+            raise ValueError("Unknown order %r. Must be 'depth-first' or 'unordered'." % (order,))
+        if workers and futures is not None:
+            return _walk_parallel(_target(self), workers, order, max_pending or workers * 16)
+        else:
+            return self.__serial_tree()
+
+    def __serial_tree(self):
         for path in self.list:
             yield path
             if path.isdir:
@@ -503,74 +1568,1910 @@ class Path(AbstractPath):
         if not self.isdir:
             raise PathMustBeDirectory("%r is not a directory nor a zip !" % self)
 
-        for name in os.listdir(self):
-            yield pth(ospath.join(self, name))
+        if scandir is None:
+            for name in os.listdir(_target(self)):
+                yield pth(ospath.join(_target(self), name))
+        else:
+            entries = scandir(_target(self))
+            try:
+                for entry in entries:
+                    yield _from_direntry(entry)
+            finally:
+                if hasattr(entries, 'close'):
+                    entries.close()
 
     def __call__(self, *open_args, **open_kwargs):
         if not self.isdir:
+            mode = open_args[0] if open_args else open_kwargs.get('mode', 'r')
             try:
-                return io.open(self, *open_args, **open_kwargs)
+                fh = io.open(_target(self), *open_args, **open_kwargs)
             except IOError as exc:
                 if exc.errno == errno.ENOENT:
                     raise_(PathMustBeFile, exc)
                 else:
                     raise
+            if set(mode) & set('wax+'):
+                # the file may have just been created or truncated
+                self._invalidate()
+            return fh
         else:
             raise PathMustBeFile("%r is not a file !" % self)
 
-    @property
-    def cd(self):
-        return WorkingDir(self)
+    def read_bytes(self):
+        with self('rb') as fh:
+            return fh.read()
 
-    def copy(self, dest):
-        if not isinstance(dest, Path):
-            dest = Path(dest)
-        if dest.isdir:
-            dest = dest / self.name
-        shutil.copyfile(self, dest)
-        return dest
+    def read_text(self, encoding=None, errors=None):
+        with self('r', encoding=encoding, errors=errors) as fh:
+            return fh.read()
 
+    def readinto(self, buffer, offset=0, length=None):
+        """
+        Read the file, starting at `offset`, into the writable `buffer` (up to `length` bytes or the buffer's size).
+        Returns the number of bytes read. Uses positional reads, the file offset is not involved.
+        """
+        view = _byte_view(buffer, length)
+        if self.isdir:
+            raise PathMustBeFile("%r is not a file !" % self)
+        fd = os.open(_target(self), os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            if hasattr(os, 'preadv'):
+                return _readinto_fd(fd, view, offset, lambda fd, view, offset: os.preadv(fd, [view], offset))
+            else:
+                with io.open(fd, 'rb', buffering=0, closefd=False) as fh:
+                    fh.seek(offset)
+                    return _readinto_fh(fh, view)
+        finally:
+            os.close(fd)
 
-class WorkingDirAlreadyActive(Exception):
-    pass
+    def hash(self, algo='sha256', cache=None):
+        """
+        Hex digest of the file's contents, with any ``hashlib`` algorithm. Results are looked up in and stored into
+        the optional `cache` (a :class:`HashCache`).
+        """
+        if self.isdir:
+            raise PathMustBeFile("%r is not a file !" % self)
+        with io.open(_target(self), 'rb', buffering=0) as fh:
+            if cache is not None:
+                key = HashCache.key(os.fstat(fh.fileno()), algo)
+                digest = cache.get(key)
+                if digest is not None:
+                    return digest
+            hasher = hashlib.new(algo)
+            buf = bytearray(CHUNK_SIZE)
+            view = memoryview(buf)
+            while True:
+                size = fh.readinto(buf)
+                if not size:
+                    break
+                hasher.update(view[:size])
+        digest = hasher.hexdigest()
+        if cache is not None:
+            cache.set(key, digest)
+        return digest
+
+    def iter_chunks(self, size=CHUNK_SIZE, offset=0, length=None, readahead=False):
+        """
+        Stream the file as chunks of `size` bytes, starting at `offset`, for `length` bytes (or until the end). After
+        the first one, reads are aligned on `size`. The kernel is told the access is sequential and, with
+        `readahead`, to start loading the next chunk while the current one is processed.
+        """
+        if self.isdir:
+            raise PathMustBeFile("%r is not a file !" % self)
+        fd = os.open(_target(self), os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            fadvise = getattr(os, 'posix_fadvise', None)
+            if fadvise:
+                fadvise(fd, offset, length or 0, os.POSIX_FADV_SEQUENTIAL)
+            remaining = length
+            if offset:
+                os.lseek(fd, offset, os.SEEK_SET)
+            want = size - offset % size
+            while remaining is None or remaining > 0:
+                if remaining is not None:
+                    want = min(want, remaining)
+                if readahead and fadvise:
+                    fadvise(fd, offset + want, size, os.POSIX_FADV_WILLNEED)
+                chunk = os.read(fd, want)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+                want = size
+        finally:
+            os.close(fd)
+
+    def iter_lines(self, encoding=None, errors='strict', keepends=True, size=CHUNK_SIZE, **kwargs):
+        """
+        Stream the file's lines (split on ``\\n``), as bytes or as text if an `encoding` is given. Other arguments
+        are passed to :meth:`iter_chunks`.
+        """
+        return _iter_lines(self.iter_chunks(size, **kwargs), encoding, errors, keepends)
 
+    def mmap(self, access=mmapmod.ACCESS_READ):
+        """
+        Map the whole file in memory. Returns a ``mmap.mmap`` object - or, as empty files can't be mapped, an empty
+        ``memoryview`` for them (like :meth:`ZipPath.mmap` does for empty members).
+        """
+        if self.isdir:
+            raise PathMustBeFile("%r is not a file !" % self)
+        with io.open(_target(self), 'r+b' if access == mmapmod.ACCESS_WRITE else 'rb') as fh:
+            if not os.fstat(fh.fileno()).st_size:
+                return memoryview(b'')
+            return mmapmod.mmap(fh.fileno(), 0, access=access)
 
-class WorkingDir(Path):
-    previous = None
-    __in_context = False
+    @property
+    def cd(self):
+        return WorkingDir(_target(self))
 
-    def __cd(self):
-        if not self.isdir:
-            raise PathMustBeDirectory("%r is not a directory!" % self)
+    def lcd(self, opendir=False):
+        """
+        Returns a :class:`LocalWorkingDir`, a context manager changing the working directory for ``pth()`` in the
+        current thread or task only.
+        """
+        return LocalWorkingDir(_target(self), opendir=opendir)
 
-        self.previous = Path(os.getcwd())
-        os.chdir(self)
-        return self
+    def copy(self, dest, strategy=None, preserve=False):
+        """
+        Copy the file contents to `dest` (a file or a directory). The returned path has the name of the strategy
+        that did the copy in its ``strategy`` attribute.
 
-    def __enter__(self):
-        if self.__in_context:
-            raise WorkingDirAlreadyActive("Already switched to %r" % self)
-        self.__in_context = True
-        return self.__cd()
+        By default the fastest available strategy is used, falling back to the next one if the kernel or the
+        filesystem doesn't support it: ``'reflink'``, ``'copy_file_range'``, ``'sendfile'``, ``'userspace'``.
+        Pass a name (or a sequence of names) as `strategy` to override.
 
-    def __call__(self):
-        if self.__in_context:
-            raise WorkingDirAlreadyActive("Already switched to %r" % self)
-        return self.__cd()
+        With `preserve` the permission bits, times and flags are copied too (like ``shutil.copy2``).
+        """
+        dest = Path(_target(dest, self._base))
+        if dest.isdir:
+            dest = Path(dest / self.name)
+        dest.strategy = _copyfile(_target(self), dest, strategy)
+        if preserve:
+            shutil.copystat(_target(self), dest)
+        _invalidate_stat(dest)
+        return dest
 
-    def __exit__(self, *exc):
-        os.chdir(self.previous)
+    def watch(self, recursive=True, debounce=0.1, events=None, backend=None, interval=1.0):
+        """
+        Returns a :class:`Watcher`, an iterator (sync or async) of :class:`WatchEvent` for the changes in this
+        directory (and its subdirectories if `recursive`, new ones included). Bursts of changes are coalesced: events
+        are collected until a `debounce` seconds pause and each path shows up once per batch. `events` limits the
+        event types to yield.
 
-    def __repr__(self):
-        return 'pth.WorkingDir(%r)' % string(self)
+        Uses inotify where available (`backend` ``'inotify'``), otherwise (`backend` ``'poll'``) the tree is
+        rescanned every `interval` seconds.
+        """
+        return Watcher(_target(self), recursive=recursive, debounce=debounce, events=events, backend=backend,
+                       interval=interval)
 
+    def search(self, name=None, ext=None, min_size=None, newer_than=None, type=None, max_depth=None, prune=None):
+        """
+        Yields the paths under this directory (symlinks are not followed) that pass all the given filters:
 
-class ZipPath(AbstractPath):
+        * `name` - a glob pattern, a list of patterns or a callable taking a ``DirEntry``;
+        * `ext` - an extension (``'.txt'``) or a list of extensions;
+        * `min_size` - minimum size in bytes;
+        * `newer_than` - a timestamp or a path, only things modified after it are yielded;
+        * `type` - ``'file'``, ``'dir'`` or ``'link'`` (or ``'f'``, ``'d'``, ``'l'``);
+        * `max_depth` - how deep to go, ``0`` means just the immediate children;
+        * `prune` - a glob pattern, a list of patterns or a callable taking a ``DirEntry``, matching directories are
+          not descended into (nor yielded).
+
+        The filters run on the ``DirEntry`` objects, so no path objects are built for what's filtered out and the
+        cheap checks (type, name) run before the ones needing a ``stat`` call (size, mtime).
+
+        (Not named ``find``: that's :meth:`str.find`, which ``os.path`` functions rely on.)
+        """
+        checks = []
+        if type is not None:
+            kind = {'f': 'file', 'd': 'dir', 'l': 'link'}.get(type, type)
+            if kind == 'file':
+                checks.append(lambda entry: entry.is_file(follow_symlinks=False))
+            elif kind == 'dir':
+                checks.append(lambda entry: entry.is_dir(follow_symlinks=False))
+            elif kind == 'link':
+                checks.append(lambda entry: entry.is_symlink())
+            else:
+                raise ValueError('Invalid type %r, must be one of: file, dir, link.' % type)
+        if name is not None:
+            checks.append(_name_filter(name))
+        if ext is not None:
+            suffixes = (ext,) if isinstance(ext, string) else tuple(ext)
+            checks.append(lambda entry: entry.name.endswith(suffixes))
+        if min_size is not None:
+            checks.append(lambda entry: entry.stat(follow_symlinks=False).st_size >= min_size)
+        if newer_than is not None:
+            # in nanoseconds: on Python 2 the scandir module's stat results have them, os.stat's don't
+            if isinstance(newer_than, string):
+                newer_than = _mtime_ns(os.stat(_target(newer_than, self._base)))
+            else:
+                newer_than = int(newer_than * 1000000000)
+            checks.append(lambda entry: _mtime_ns(entry.stat(follow_symlinks=False)) > newer_than)
+        prune = _name_filter(prune)
+
+        for _, entry in _walk_entries(_target(self), prune, max_depth):
+            if prune and entry.is_dir(follow_symlinks=False) and prune(entry):
+                continue
+            if all(check(entry) for check in checks):
+                yield _from_direntry(entry)
+
+    def glob(self, pattern):
+        """
+        Yields the paths under this directory matching `pattern` (a :class:`GlobPattern` or a string).
+        """
+        if not isinstance(pattern, GlobPattern):
+            pattern = GlobPattern(pattern)
+
+        def scan(path):
+            try:
+                entries = _scandir(path)
+            except OSError:
+                return []
+            return [(entry.name, _entry_is_dir(entry), entry.is_symlink(), entry) for entry in entries]
+
+        def kind(path):
+            try:
+                return statmod.S_ISDIR(_stat(path).st_mode)
+            except OSError:
+                return None if not ospath.lexists(path) else False
+
+        for path, entry in pattern.walk(string(_target(self)), scan, kind, ospath.join):
+            yield pth(path) if entry is None or scandir is None else _from_direntry(entry)
+
+    def rglob(self, pattern):
+        return self.glob('**/' + pattern)
+
+    def snapshot(self, previous=None, algo=None, workers=None):
+        """
+        Returns a :class:`Snapshot` of everything under this directory (symlinks are not followed), with the digests
+        of the files if an `algo` is given (computed on `workers` threads).
+
+        With a `previous` snapshot of the same directory, the listings of directories whose mtime didn't change are
+        reused instead of being read again and so are the digests of files whose inode, size and mtime didn't change.
+        Files are always stat'ed, changing the contents of a file doesn't change its directory's mtime.
+        """
+        root = string(_target(self))
+        snapshot = Snapshot(root, algo, _mtime_ns(os.stat(root)))
+        listings = index = None
+        if previous is not None:
+            listings = previous.listings()
+            index = previous.index()
+        rows = []
+
+        def visit(relpath, path, mtime_ns):
+            if listings is None or relpath not in listings or mtime_ns != (
+                previous.mtime_ns[index[relpath]] if relpath else previous.root_mtime_ns
+            ):
+                children = [(entry.name, entry.path, entry) for entry in _scandir(path)]
+            else:
+                children = [(name, ospath.join(path, name), None) for name in listings[relpath]]
+            for name, child, entry in children:
+                try:
+                    # before Python 3.3 the scandir module's times don't match os.lstat's, which the reused listings
+                    # need, so it's used for everything
+                    st = os.lstat(child) if entry is None or not PY33 else entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                child_relpath = relpath + '/' + name if relpath else name
+                isdir = statmod.S_ISDIR(st.st_mode)
+                rows.append((child_relpath, isdir, st.st_size, _mtime_ns(st), st.st_ino, statmod.S_ISREG(st.st_mode)))
+                if isdir:
+                    visit(child_relpath, child, _mtime_ns(st))
+
+        visit('', root, snapshot.root_mtime_ns)
+        rows.sort()
+        for relpath, isdir, size, mtime_ns, inode, _ in rows:
+            snapshot.paths.append(relpath)
+            snapshot.isdir.append(isdir)
+            snapshot.size.append(size)
+            snapshot.mtime_ns.append(mtime_ns)
+            snapshot.inode.append(inode)
+        if algo:
+            reuse = previous is not None and previous.algo == algo
+            pending = []
+            for relpath, _, size, mtime_ns, inode, isreg in rows:
+                digest = None
+                if reuse and relpath in index:
+                    i = index[relpath]
+                    if (previous.inode[i], previous.size[i], previous.mtime_ns[i]) == (inode, size, mtime_ns):
+                        digest = previous.hashes[i]
+                if digest is None and isreg:
+                    pending.append(len(snapshot.hashes))
+                snapshot.hashes.append(digest)
+            digests = _map(lambda i: Path(ospath.join(root, snapshot.paths[i])).hash(algo), pending, workers)
+            for i, digest in zip(pending, digests):
+                snapshot.hashes[i] = digest
+        return snapshot
+
+    def disk_usage(self, apparent=False, workers=None, max_depth=None):
+        """
+        Total size of this directory and of every subdirectory, like ``du``. Returns an ``OrderedDict`` mapping
+        directory paths to sizes in bytes, subdirectories before their parents.
+
+        Sizes are allocated space (``st_blocks``) unless `apparent` is true. Hardlinked files are counted once,
+        symlinks are not followed. Only directories at most `max_depth` levels below this one are reported, but all
+        are counted. Directories are listed on `workers` threads.
+        """
+        if not self.isdir:
+            raise PathMustBeDirectory("%r is not a directory!" % self)
+        seen = set()
+        lock = threading.Lock()
+
+        def size_of(st):
+            if st.st_nlink > 1 and not statmod.S_ISDIR(st.st_mode):
+                with lock:
+                    if (st.st_dev, st.st_ino) in seen:
+                        return 0
+                    seen.add((st.st_dev, st.st_ino))
+            if apparent or not hasattr(st, 'st_blocks'):
+                return st.st_size
+            return st.st_blocks * 512
+
+        def scan(path):
+            total, dirs = 0, []
+            for entry in _scandir(path):
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if statmod.S_ISDIR(st.st_mode):
+                    dirs.append((entry.path, size_of(st)))
+                else:
+                    total += size_of(st)
+            return path, total, dirs
+
+        root = string(_target(self))
+        totals = {root: size_of(os.stat(root))}
+        depths = {root: 0}
+        # explicit parent links: ``dirname`` of a child doesn't give back a root like ``'a/'`` or ``'a/.'``
+        parents = {}
+        for path, total, dirs in _map_recursive(scan, root, lambda result: [path for path, _ in result[2]], workers):
+            totals[path] += total
+            for child, size in dirs:
+                totals[child] = size
+                depths[child] = depths[path] + 1
+                parents[child] = path
+        usage = OrderedDict()
+        for path in sorted(totals, key=lambda path: -depths[path]):
+            if path != root:
+                totals[parents[path]] += totals[path]
+        for path in sorted(totals, key=lambda path: (-depths[path], path)):
+            if max_depth is None or depths[path] <= max_depth:
+                usage[Path(path)] = totals[path]
+        return usage
+
+    if hasattr(os, 'fwalk') and hasattr(os, 'O_DIRECTORY'):
+        def opendir(self):
+            """
+            Returns a :class:`DirHandle` holding this directory open, to work on its contents without resolving the
+            full path each time.
+            """
+            return DirHandle(_target(self))
+
+    def rmtree(self, workers=None, onerror=None, background=False):
+        """
+        Recursively delete this directory. Every subdirectory is opened relative to its parent's file descriptor
+        (without following symlinks) and everything is unlinked relative to its directory's descriptor, so nothing
+        outside the tree can be deleted if it changes meanwhile. The directories are cleared on `workers` threads.
+
+        `onerror` is called like ``shutil.rmtree``'s: ``onerror(function, path, exc_info)``. Without it errors raise.
+
+        With `background` the directory is first renamed to a hidden sibling and deleted by a thread, which is
+        returned (join it if you need to wait).
+        """
+        if background:
+            parent, name = ospath.split(ospath.abspath(_target(self)))
+            trash = Path(tempfile.mkdtemp(prefix='.%s.pth-trash-' % name, dir=parent))
+            os.rename(_target(self), trash / name)
+            self._direntry = None
+            _invalidate_stat()
+            thread = threading.Thread(target=trash.rmtree, kwargs=dict(workers=workers, onerror=onerror))
+            thread.start()
+            return thread
+
+        if onerror is None:
+            def onerror(*args):
+                raise
+        if _rmtree_fd_supported:
+            _rmtree(_target(self), workers, onerror)
+        else:
+            shutil.rmtree(_target(self), onerror=onerror)
+        self._direntry = None
+        _invalidate_stat()
+
+    def copytree(self, dest, workers=None, include=None, exclude=None, preserve=False, incremental=False,
+                 strategy=None):
+        """
+        Recursively copy this directory to `dest`. Directories are created first, then the files are copied with
+        :meth:`copy` on `workers` threads.
+
+        `include` and `exclude` are ``fnmatch`` patterns (or sequences of patterns, or callables taking a
+        :class:`Path`) applied on names: files must match `include`, and excluded directories are not descended.
+
+        With `incremental` files whose size and mtime already match at the destination are skipped. Modification
+        times are always copied in this mode so the next run can skip the files.
+        """
+        dest = Path(_target(dest, self._base))
+        include = _name_filter(include)
+        exclude = _name_filter(exclude)
+        dirs = [(self, dest)]
+        files = []
+        for src_dir, dest_dir in dirs:
+            for path in src_dir.list:
+                if exclude and exclude(path):
+                    continue
+                if isinstance(path, Path) and path.isdir:
+                    dirs.append((path, Path(dest_dir / path.name)))
+                elif not include or include(path):
+                    files.append((Path(path), Path(dest_dir / path.name)))
+
+        for _, dest_dir in dirs:
+            if not dest_dir.isdir:
+                dest_dir.makedirs()
+
+        def copy(src, target):
+            if incremental:
+                try:
+                    src_stat, target_stat = os.stat(src), os.stat(target)
+                except OSError:
+                    pass
+                else:
+                    if src_stat.st_size == target_stat.st_size and _mtime(src_stat) == _mtime(target_stat):
+                        return
+            src.copy(target, strategy=strategy, preserve=preserve)
+            if incremental and not preserve:
+                src_stat = os.stat(src)
+                if PY33:
+                    os.utime(target, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+                else:
+                    os.utime(target, (src_stat.st_atime, src_stat.st_mtime))
+
+        if workers and futures is not None:
+            with futures.ThreadPoolExecutor(workers) as executor:
+                for future in [executor.submit(copy, src, target) for src, target in files]:
+                    future.result()
+        else:
+            for src, target in files:
+                copy(src, target)
+
+        if preserve:
+            for src_dir, dest_dir in reversed(dirs):
+                shutil.copystat(_target(src_dir), dest_dir)
+        return dest
+
+
+def _mtime(st):
+    return getattr(st, 'st_mtime_ns', st.st_mtime)
+
+
+def _name_filter(patterns):
+    if patterns is None or callable(patterns):
+        return patterns
+    if isinstance(patterns, string):
+        patterns = [patterns]
+    return lambda path: any(fnmatch.fnmatch(path.name, pattern) for pattern in patterns)
+
+
+_rmtree_fd_supported = (
+    scandir is not None and hasattr(os, 'O_DIRECTORY') and hasattr(os, 'O_NOFOLLOW') and
+    set([os.open, os.unlink, os.rmdir]) <= getattr(os, 'supports_dir_fd', set()) and
+    scandir in getattr(os, 'supports_fd', ())
+)
+
+
+class _RmtreeNode(object):
+    # a directory being deleted: it's opened (relative to its parent) when it's about to be cleared and `fd` stays
+    # open until all its children are gone since they're removed through it
+    def __init__(self, path, parent, name):
+        self.fd = None
+        self.path = path
+        self.parent = parent
+        self.name = name
+        self.pending = 1
+
+
+def _rmtree(root, workers, onerror, dir_fd=None, name=None):
+    """
+    Deletes the directory `root` - or, with a `dir_fd`, the directory `name` (a single component) in it, `root` is
+    then only used in error reports. Every directory is opened relative to its parent's descriptor with
+    ``O_NOFOLLOW`` and everything is unlinked or removed relative to its directory's descriptor, so swapping a
+    directory for a symlink while this runs can't make it delete anything outside the tree.
+    """
+    if name is None:
+        name = string(root)
+    try:
+        islink = statmod.S_ISLNK(os.lstat(name, dir_fd=dir_fd).st_mode)
+    except OSError:
+        islink = False  # reported when opening it
+    if islink:
+        try:
+            raise OSError("Cannot call rmtree on a symbolic link")
+        except OSError:
+            onerror(ospath.islink, root, sys.exc_info())
+            return
+    flags = os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW
+    top = _RmtreeNode(ospath.dirname(root), None, None)
+    top.fd = dir_fd
+    opened = set()
+    lock = threading.Lock()
+
+    def release(node):
+        # `node` is done with one of its children (or with itself, if it couldn't be opened)
+        with lock:
+            node.pending -= 1
+            if node.pending:
+                return
+        while node is not top:
+            os.close(node.fd)
+            with lock:
+                opened.discard(node)
+            node.fd = None
+            try:
+                os.rmdir(node.name, dir_fd=node.parent.fd)
+            except OSError:
+                onerror(os.rmdir, node.path, sys.exc_info())
+            node = node.parent
+            with lock:
+                node.pending -= 1
+                if node.pending:
+                    return
+
+    def clear(node):
+        # unlinks everything but the subdirectories, which are returned
+        try:
+            node.fd = os.open(node.name, flags, dir_fd=node.parent.fd)
+        except OSError:
+            onerror(os.open, node.path, sys.exc_info())
+            release(node.parent)
+            return []
+        with lock:
+            opened.add(node)
+        children = []
+        try:
+            entries = list(scandir(node.fd))
+        except OSError:
+            onerror(scandir, node.path, sys.exc_info())
+            entries = []
+        for entry in entries:
+            try:
+                isdir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                isdir = False
+            if isdir:
+                children.append(_RmtreeNode(ospath.join(node.path, entry.name), node, entry.name))
+            else:
+                try:
+                    os.unlink(entry.name, dir_fd=node.fd)
+                except OSError:
+                    onerror(os.unlink, ospath.join(node.path, entry.name), sys.exc_info())
+        with lock:
+            node.pending += len(children)
+        release(node)
+        return children
+
+    root = _RmtreeNode(string(root), top, name)
+    try:
+        if workers and futures is not None:
+            with futures.ThreadPoolExecutor(workers) as executor:
+                running = set([executor.submit(clear, root)])
+                while running:
+                    done, running = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+                    for future in done:
+                        for child in future.result():
+                            running.add(executor.submit(clear, child))
+        else:
+            pending = [root]
+            while pending:
+                pending.extend(clear(pending.pop()))
+    finally:
+        # only left open if `onerror` raised
+        for node in opened:
+            os.close(node.fd)
+
+
+def _listdir(path):
+    return list(path.list)
+
+
+def _walk_parallel(root, workers, order, max_pending):
+    """
+    Like the serial ``Path.tree`` but the directory listings are done on a pool of `workers` threads. With
+    ``order='depth-first'`` the output is identical to the serial walk (listings of subdirectories are prefetched);
+    with ``order='unordered'`` paths are yielded as soon as their directory is listed.
+
+    At most `max_pending` listings are in flight or waiting to be consumed at any time.
+    """
+    executor = futures.ThreadPoolExecutor(workers)
+    try:
+        if order == 'unordered':
+            walk = _walk_unordered(root, executor, max_pending)
+        else:
+            walk = _walk_depth_first(root, executor, max_pending)
+        for path in walk:
+            yield path
+    finally:
+        executor.shutdown()
+
+
+def _walk_unordered(root, executor, max_pending):
+    # unlisted directories are kept in a stack so the frontier stays close to a depth-first walk's
+    todo = [root]
+    running = set()
+    while todo or running:
+        while todo and len(running) < max_pending:
+            running.add(executor.submit(_listdir, todo.pop()))
+        done, running = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+        for future in done:
+            for path in future.result():
+                yield path
+                if path.isdir:
+                    if isinstance(path, Path):
+                        todo.append(path)
+                    else:
+                        for i in path.tree:
+                            yield i
+
+
+def _walk_depth_first(root, executor, max_pending):
+    pending = [0]
+
+    def submit(path):
+        pending[0] += 1
+        return executor.submit(_listdir, path)
+
+    def walk(future):
+        paths = future.result()
+        pending[0] -= 1
+        prefetched = {}
+        for i, path in enumerate(paths):
+            if pending[0] >= max_pending:
+                break
+            if isinstance(path, Path) and path.isdir:
+                prefetched[i] = submit(path)
+        for i, path in enumerate(paths):
+            yield path
+            if path.isdir:
+                if isinstance(path, Path):
+                    for j in walk(prefetched.pop(i, None) or submit(path)):
+                        yield j
+                else:
+                    for j in path.tree:
+                        yield j
+
+    return walk(submit(root))
+
+
+def _entry_is_dir(entry):
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+def _from_direntry(entry):
+    path = Path(entry.path)
+    path._direntry = entry
+    try:
+        if entry.is_file() and zipcache(path):
+            return ZipPath(path)
+    except OSError:
+        pass
+    return path
+
+
+FICLONE = 0x40049409
+
+
+def _copy_reflink(src_fd, dest_fd):
+    fcntl.ioctl(dest_fd, FICLONE, src_fd)
+
+
+class _CopiedNothing(Exception):
+    # raised by the kernel strategies when nothing could be copied: the file is either empty or one of those
+    # (procfs, sysfs) that report a size of 0 but still have contents, the next strategy is tried
+    pass
+
+
+def _copy_file_range(src_fd, dest_fd):
+    if not os.copy_file_range(src_fd, dest_fd, 1 << 30):
+        raise _CopiedNothing()
+    while os.copy_file_range(src_fd, dest_fd, 1 << 30):
+        pass
+
+
+def _copy_sendfile(src_fd, dest_fd):
+    offset = 0
+    while True:
+        sent = os.sendfile(dest_fd, src_fd, offset, 1 << 30)
+        if not sent:
+            if not offset:
+                raise _CopiedNothing()
+            break
+        offset += sent
+
+
+def _copy_userspace(src_fd, dest_fd):
+    buf = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buf)
+    with io.open(src_fd, 'rb', buffering=0, closefd=False) as src:
+        while True:
+            size = src.readinto(buf)
+            if not size:
+                break
+            written = 0
+            while written < size:
+                written += os.write(dest_fd, view[written:size])
+
+
+COPY_STRATEGIES = OrderedDict([
+    ('reflink', _copy_reflink if fcntl is not None and sys.platform.startswith('linux') else None),
+    ('copy_file_range', _copy_file_range if hasattr(os, 'copy_file_range') else None),
+    ('sendfile', _copy_sendfile if hasattr(os, 'sendfile') and sys.platform.startswith('linux') else None),
+    ('userspace', _copy_userspace),
+])
+# errors meaning "this strategy doesn't work for these files", as opposed to real I/O errors
+COPY_FALLBACK_ERRNOS = set(getattr(errno, name) for name in (
+    'EXDEV', 'ENOSYS', 'EOPNOTSUPP', 'ENOTSUP', 'EINVAL', 'ENOTTY', 'EBADF', 'EPERM', 'ETXTBSY'
+) if hasattr(errno, name))
+
+
+def _check_regular(mode, path):
+    if statmod.S_ISDIR(mode):
+        raise OSError(errno.EISDIR, os.strerror(errno.EISDIR), path)
+    elif not statmod.S_ISREG(mode):
+        raise shutil.SpecialFileError("%r is not a regular file" % path)
+
+
+def _copyfile(src, dest, strategy=None):
+    if strategy is None:
+        strategies = [name for name, func in COPY_STRATEGIES.items() if func is not None]
+    elif isinstance(strategy, string):
+        strategies = [strategy]
+    else:
+        strategies = list(strategy)
+    for name in strategies:
+        if name not in COPY_STRATEGIES:
+            raise ValueError("Unknown copy strategy %r. Must be one of: %s." % (name, ', '.join(COPY_STRATEGIES)))
+        if COPY_STRATEGIES[name] is None and strategy is not None:
+            raise PathError("Copy strategy %r is not supported on this platform." % name)
+
+    if ospath.exists(dest) and ospath.samefile(src, dest):
+        raise getattr(shutil, 'SameFileError', shutil.Error)("%r and %r are the same file" % (src, dest))
+    # checked before opening (opening a fifo blocks) and again on the open file, before `dest` is created
+    _check_regular(os.stat(src).st_mode, src)
+    src_fd = os.open(src, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        _check_regular(os.fstat(src_fd).st_mode, src)
+        dest_fd = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            for name in strategies:
+                func = COPY_STRATEGIES[name]
+                if func is None:
+                    continue
+                try:
+                    func(src_fd, dest_fd)
+                except _CopiedNothing:
+                    if name == strategies[-1]:
+                        return name
+                except EnvironmentError as exc:  # fcntl.ioctl raises IOError on Python 2
+                    if exc.errno not in COPY_FALLBACK_ERRNOS or name == strategies[-1]:
+                        raise
+                    os.lseek(src_fd, 0, os.SEEK_SET)
+                    os.lseek(dest_fd, 0, os.SEEK_SET)
+                    os.ftruncate(dest_fd, 0)
+                else:
+                    return name
+        finally:
+            os.close(dest_fd)
+    finally:
+        os.close(src_fd)
+
+
+_fsencode = getattr(os, 'fsencode', lambda path: path)
+_fsdecode = getattr(os, 'fsdecode', lambda path: path)
+
+
+class WatchEvent(namedtuple('WatchEvent', 'type path dest')):
+    """
+    A filesystem change: `type` is one of ``'created'``, ``'modified'``, ``'deleted'`` or ``'moved'`` and `dest` is
+    the new path for moves (``None`` otherwise).
+    """
+    __slots__ = ()
+
+
+def _coalesce(events):
+    # merges the events of a batch so that every path shows up at most once, in order of last change
+    state = OrderedDict()
+    for kind, path, dest in events:
+        previous = state.pop(path, None)
+        if kind == 'moved':
+            # what's pending under a moved directory is now under its destination
+            prefix = path + ospath.sep
+            children = [
+                (child, state.pop(child)) for child in list(state)
+                if child.startswith(prefix) and state[child][0] in ('created', 'modified')
+            ]
+            moved = state.pop(dest, None)
+            if previous and previous[0] == 'created':
+                state[dest] = ('created', None)
+            else:
+                state[path] = ('moved', dest)
+                if moved and moved[0] == 'deleted':
+                    state[dest] = ('modified', None)
+            for child, change in children:
+                state[dest + child[len(path):]] = change
+            continue
+        if previous:
+            if previous[0] == 'created' and kind == 'deleted':
+                continue
+            elif previous[0] == 'created' and kind != 'deleted':
+                kind = 'created'
+            elif previous[0] == 'deleted' and kind == 'created':
+                kind = 'modified'
+        state[path] = (kind, None)
+    return [WatchEvent(kind, Path(path), dest if dest is None else Path(dest)) for path, (kind, dest) in state.items()]
+
+
+class _InotifyBackend(object):
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x1000000
+    IN_DONTFOLLOW = 0x2000000
+    IN_ISDIR = 0x40000000
+    MASK = (
+        IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF |
+        IN_ONLYDIR | IN_DONTFOLLOW
+    )
+    header = struct.Struct('iIII')
+    libc = None
+
+    @classmethod
+    def available(cls):
+        if cls.libc is None:
+            cls.libc = False
+            if ctypes is not None and sys.platform.startswith('linux'):
+                try:
+                    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+                    libc.inotify_init1
+                except (OSError, AttributeError):
+                    pass
+                else:
+                    cls.libc = libc
+        return bool(cls.libc)
+
+    def __init__(self, root, recursive):
+        self.root = root
+        self.recursive = recursive
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+        if self.fd < 0:
+            raise_(OSError, os.strerror(ctypes.get_errno()))
+        self.wake_r, self.wake_w = os.pipe()
+        self.watches = {}
+        self.moves = OrderedDict()
+        # the descriptors belong to whoever is polling: close() only wakes it up, it closes them on the way out
+        self.lock = threading.Lock()
+        self.polling = False
+        self.closed = False
+        try:
+            self.add(root, strict=True)
+        except Exception:
+            self.release()
+            raise
+
+    def add(self, path, events=None, strict=False):
+        # watches `path` (and the directories under it if recursive), recording what's already in there as created
+        # in `events` - it could have been created before the watch was in place
+        wd = self.libc.inotify_add_watch(self.fd, _fsencode(path), self.MASK)
+        if wd < 0:
+            code = ctypes.get_errno()
+            if strict or code not in (errno.ENOENT, errno.ENOTDIR):
+                raise OSError(code, os.strerror(code), path)
+            return
+        self.watches[wd] = path
+        if not self.recursive:
+            return
+        try:
+            entries = _scandir(path)
+        except OSError:
+            return
+        for entry in entries:
+            if events is not None:
+                events.append(('created', entry.path, None))
+            if entry.is_dir(follow_symlinks=False):
+                self.add(entry.path, events)
+
+    def forget(self, path):
+        for wd, watched in list(self.watches.items()):
+            if watched == path or watched.startswith(path + ospath.sep):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                self.watches.pop(wd, None)
+
+    def rename(self, src, dest):
+        for wd, watched in self.watches.items():
+            if watched == src or watched.startswith(src + ospath.sep):
+                self.watches[wd] = dest + watched[len(src):]
+
+    def poll(self, timeout):
+        with self.lock:
+            if self.closed or not self.watches:
+                return None
+            self.polling = True
+        try:
+            return self.wait(timeout)
+        finally:
+            with self.lock:
+                self.polling = False
+                if self.closed:
+                    self.release()
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self.fd, self.wake_r], [], [], timeout)
+        if self.wake_r in readable:
+            return None
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except OSError as exc:
+            if exc.errno == errno.EAGAIN:
+                return []
+            raise
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = self.header.unpack_from(data, offset)
+            offset += self.header.size
+            name = _fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            self.handle(wd, mask, cookie, name, events)
+        return events
+
+    def handle(self, wd, mask, cookie, name, events):
+        if mask & self.IN_Q_OVERFLOW:
+            events.append(('modified', self.root, None))
+            return
+        directory = self.watches.get(wd)
+        if directory is None:
+            return
+        path = ospath.join(directory, name) if name else directory
+        isdir = mask & self.IN_ISDIR
+        if mask & self.IN_IGNORED:
+            del self.watches[wd]
+        elif mask & self.IN_CREATE:
+            events.append(('created', path, None))
+            if isdir and self.recursive:
+                self.add(path, events)
+        elif mask & (self.IN_MODIFY | self.IN_ATTRIB):
+            if not isdir and name:
+                events.append(('modified', path, None))
+        elif mask & self.IN_DELETE:
+            events.append(('deleted', path, None))
+        elif mask & self.IN_MOVED_FROM:
+            self.moves[cookie] = path, isdir
+        elif mask & self.IN_MOVED_TO:
+            if cookie in self.moves:
+                src, _ = self.moves.pop(cookie)
+                events.append(('moved', src, path))
+                if src in self.watches.values():
+                    self.rename(src, path)
+                elif isdir and self.recursive:
+                    # moved before its watch could be added (created and renamed in the same batch)
+                    self.add(path, events)
+            else:
+                events.append(('created', path, None))
+                if isdir and self.recursive:
+                    self.add(path, events)
+        elif mask & self.IN_DELETE_SELF and path == self.root:
+            events.append(('deleted', path, None))
+
+    def flush(self):
+        # moves without a matching destination went out of the watched tree
+        events = []
+        for path, isdir in self.moves.values():
+            events.append(('deleted', path, None))
+            if isdir:
+                self.forget(path)
+        self.moves.clear()
+        return events
+
+    def release(self):
+        os.close(self.fd)
+        os.close(self.wake_r)
+        os.close(self.wake_w)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self.polling:
+                os.write(self.wake_w, b'x')
+            else:
+                self.release()
+
+
+class _PollBackend(object):
+    def __init__(self, root, recursive, interval):
+        self.root = root
+        self.recursive = recursive
+        self.interval = interval
+        self.closed = threading.Event()
+        self.state = self.scan()
+        self.next_scan = _clock() + interval
+
+    def scan(self):
+        state = {}
+        if self.recursive:
+            entries = (entry for _, entry in _walk_entries(self.root))
+        else:
+            entries = _scandir(self.root)
+        try:
+            for entry in entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                state[entry.path] = st.st_ino, statmod.S_ISDIR(st.st_mode), st.st_size, _mtime(st)
+        except OSError:
+            if not ospath.isdir(self.root):
+                return None
+        return state
+
+    def poll(self, timeout):
+        if self.state is None:
+            return None
+        delay = self.next_scan - _clock()
+        if timeout is not None and timeout < delay:
+            return None if self.closed.wait(timeout) else []
+        if self.closed.wait(max(delay, 0)):
+            return None
+        self.next_scan = _clock() + self.interval
+        old, new = self.state, self.scan()
+        self.state = new
+        if new is None:
+            return [('deleted', self.root, None)]
+        # a rename keeps the inode, size and mtime - matching just the inode would take a deleted file's reused
+        # inode for a move
+        removed = dict((old[path], path) for path in old if path not in new)
+        events = []
+        for path, info in sorted(new.items()):
+            isdir = info[1]
+            if path not in old:
+                src = removed.pop(info, None)
+                if src is not None:
+                    events.append(('moved', src, path))
+                else:
+                    events.append(('created', path, None))
+            elif not isdir and old[path][2:] != info[2:]:
+                events.append(('modified', path, None))
+        events.extend(('deleted', path, None) for path in sorted(removed.values()))
+        return events
+
+    def flush(self):
+        return []
+
+    def close(self):
+        self.closed.set()
+
+
+class Watcher(object):
+    """
+    Iterator of :class:`WatchEvent` for the changes under a directory, see :meth:`Path.watch`. Also an asynchronous
+    iterator (``async for event in watcher``), the blocking reads happen in the event loop's default executor.
+    """
+    def __init__(self, path, recursive=True, debounce=0.1, events=None, backend=None, interval=1.0):
+        self.path = path
+        self.debounce = debounce
+        self.events = None if events is None else frozenset([events] if isinstance(events, string) else events)
+        if backend is None:
+            backend = 'inotify' if _InotifyBackend.available() else 'poll'
+        if backend == 'inotify':
+            if not _InotifyBackend.available():
+                raise ValueError('inotify is not available on this system.')
+            self.backend = _InotifyBackend(string(path), recursive)
+        elif backend == 'poll':
+            self.backend = _PollBackend(string(path), recursive, interval)
+        else:
+            raise ValueError('Invalid backend %r, must be one of: inotify, poll.' % backend)
+        self.pending = []
+        self.closed = False
+
+    def __repr__(self):
+        return 'pth.Watcher(%r, backend=%r)' % (string(self.path), self.backend.__class__.__name__)
+
+    def read(self, timeout=None):
+        """
+        Waits (at most `timeout` seconds) for changes and returns them as a list of coalesced events. Changes keep
+        being collected until there's a `debounce` seconds pause (but no longer than ten times that). Returns
+        ``None`` once the watcher is closed or the directory is gone.
+        """
+        if self.closed:
+            return None
+        raw = self.backend.poll(timeout)
+        if raw is None:
+            return None
+        if raw:
+            deadline = _clock() + self.debounce * 10
+            while _clock() < deadline:
+                more = self.backend.poll(self.debounce)
+                if not more:
+                    break
+                raw.extend(more)
+        raw.extend(self.backend.flush())
+        return [event for event in _coalesce(raw) if self.events is None or event.type in self.events]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self.pending:
+            events = self.read()
+            if events is None:
+                raise StopIteration()
+            self.pending.extend(events)
+        return self.pending.pop(0)
+    next = __next__
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        return _event_loop().run_in_executor(None, self.__anext)
+
+    def __anext(self):
+        try:
+            return self.__next__()
+        except StopIteration:
+            raise StopAsyncIteration()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _event_loop():
+    try:
+        return asyncio.get_running_loop()
+    except (AttributeError, RuntimeError):
+        return asyncio.get_event_loop()
+
+
+class _AsyncIterator(object):
+    # asynchronous iterator over a blocking one, `batch` items are fetched per executor hop
+    def __init__(self, aio, factory, batch):
+        self.aio = aio
+        self.factory = factory
+        self.batch = batch
+        self.iterator = None
+        self.buffer = []
+        self.closed = False
+        # a fetch and aclose() could otherwise run on two executor threads at once
+        self.lock = threading.Lock()
+
+    def __aiter__(self):
+        return self
+
+    def __fetch(self):
+        with self.lock:
+            if self.closed:
+                return []
+            if self.iterator is None:
+                self.iterator = iter(self.factory())
+            items = []
+            for item in self.iterator:
+                items.append(item)
+                if len(items) >= self.batch:
+                    break
+            return items
+
+    def __close(self):
+        with self.lock:
+            self.closed = True
+            iterator, self.iterator = self.iterator, None
+            if hasattr(iterator, 'close'):
+                iterator.close()
+
+    def aclose(self):
+        """
+        Stops the iteration and closes the underlying generator (in the executor, its cleanup may block).
+        """
+        del self.buffer[:]
+        return _event_loop().run_in_executor(self.aio.executor, self.__close)
+
+    def __anext__(self):
+        loop = _event_loop()
+        future = loop.create_future()
+        if self.buffer:
+            future.set_result(self.buffer.pop(0))
+            return future
+
+        def done(fetched):
+            if future.cancelled():
+                return
+            exception = fetched.exception()
+            if exception is not None:
+                future.set_exception(exception)
+            elif fetched.result():
+                self.buffer.extend(fetched.result())
+                future.set_result(self.buffer.pop(0))
+            else:
+                future.set_exception(StopAsyncIteration())
+        loop.run_in_executor(self.aio.executor, self.__fetch).add_done_callback(done)
+        return future
+
+
+class AsyncPath(object):
+    """
+    Asynchronous view of a path, see :class:`AIO`. Metadata (``await path.a.exists()``, ``size``, ``mtime``,
+    ``stat`` etc.) requested in the same event loop iteration is fetched in a single executor hop, use
+    :meth:`metadata` to ask for several values at once. ``tree``, ``search``, ``glob``, ``iter_chunks`` and
+    ``iter_lines`` return asynchronous iterators. Anything else (``copy``, ``read_bytes``, ``hash`` ...) is the
+    path's method, run in the executor - generators like ``list``, ``files`` and ``dirs`` are consumed there too and
+    come back as lists.
+    """
+    METADATA = frozenset(['exists', 'isdir', 'isfile', 'islink', 'isreadable', 'size', 'mtime', 'atime', 'ctime',
+                          'stat', 'lstat'])
+    ITERATORS = {'tree': 256, 'search': 256, 'glob': 256, 'rglob': 256, 'iter_lines': 256, 'iter_chunks': 1}
+
+    def __init__(self, path, aio):
+        self.path = path
+        self.aio = aio
+
+    def __repr__(self):
+        return 'pth.AsyncPath(%r)' % string(self.path)
+
+    def metadata(self, *names):
+        """
+        Future of a dict with the requested metadata values, fetched in one executor hop.
+        """
+        for name in names:
+            if name not in self.METADATA:
+                raise ValueError('Invalid metadata %r, must be one of: %s.' % (name, ', '.join(sorted(self.METADATA))))
+        return self.aio.run(lambda: dict((name, _metadata(self.path, name)) for name in names))
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        path = self.path
+        aio = self.aio
+        if name in self.METADATA:
+            return lambda: aio.metadata(path, name)
+        elif name in self.ITERATORS:
+            return lambda *args, **kwargs: _AsyncIterator(
+                aio, lambda: _attribute(path, name, args, kwargs), self.ITERATORS[name]
+            )
+        elif not hasattr(type(path), name):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: aio.run(_result, path, name, args, kwargs)
+
+
+def _attribute(path, name, args, kwargs):
+    value = getattr(path, name)
+    return value(*args, **kwargs) if callable(value) else value
+
+
+def _result(path, name, args, kwargs):
+    # an unstarted generator would do its blocking work in the event loop, when consumed
+    value = _attribute(path, name, args, kwargs)
+    return list(value) if isinstance(value, types.GeneratorType) else value
+
+
+def _metadata(path, name):
+    value = getattr(path, name)
+    return value() if isinstance(value, LazyObjectProxy) else value
+
+
+class AIO(object):
+    """
+    Asyncio facade running the blocking calls in a bounded thread pool of `max_workers` threads (or the given
+    `executor`). ``pth.aio(*parts)`` and ``path.a`` return an :class:`AsyncPath`.
+    """
+
+    def __init__(self, max_workers=16, executor=None):
+        self.max_workers = max_workers
+        self.__executor = executor
+        self.__owned = False
+        self.__lock = threading.Lock()
+        self.__pending = {}
+
+    def __call__(self, *parts):
+        return AsyncPath(pth(*parts), self)
+
+    def configure(self, max_workers=None, executor=None):
+        """
+        Switches to a new pool of `max_workers` threads (or the given `executor`). A pool created by this object is
+        shut down, without waiting for the calls in flight.
+        """
+        with self.__lock:
+            if self.__owned:
+                self.__executor.shutdown(wait=False)
+            self.__executor = executor
+            self.__owned = False
+            if max_workers is not None:
+                self.max_workers = max_workers
+
+    @property
+    def executor(self):
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = futures.ThreadPoolExecutor(self.max_workers)
+                self.__owned = True
+            return self.__executor
+
+    def run(self, func, *args, **kwargs):
+        """
+        Future of ``func(*args, **kwargs)`` called in the executor.
+        """
+        if kwargs:
+            return _event_loop().run_in_executor(self.executor, lambda: func(*args, **kwargs))
+        return _event_loop().run_in_executor(self.executor, func, *args)
+
+    def metadata(self, path, name):
+        """
+        Future of the `name` metadata of `path`. All the requests made in the same event loop iteration are
+        resolved in one executor hop.
+        """
+        loop = _event_loop()
+        future = loop.create_future()
+        pending = self.__pending.get(loop)
+        if pending is None:
+            pending = self.__pending[loop] = []
+            loop.call_soon(self.__flush, loop)
+        pending.append((path, name, future))
+        return future
+
+    def __flush(self, loop):
+        batch = self.__pending.pop(loop)
+
+        def fetch():
+            results = []
+            for path, name, _ in batch:
+                try:
+                    results.append((True, _metadata(path, name)))
+                except Exception as exc:
+                    results.append((False, exc))
+            return results
+
+        def done(fetched):
+            exception = fetched.exception()
+            results = [(False, exception)] * len(batch) if exception else fetched.result()
+            for (_, _, future), (ok, value) in zip(batch, results):
+                if not future.cancelled():
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+        loop.run_in_executor(self.executor, fetch).add_done_callback(done)
+
+    def stat_many(self, paths, **kwargs):
+        """
+        Future of :func:`stat_many`, in one executor hop.
+        """
+        return self.run(stat_many, paths, **kwargs)
+
+
+aio = AIO()
+
+
+class DirHandle(object):
+    """
+    An open directory, see :meth:`Path.opendir`. Names given to the methods are resolved relative to the directory's
+    file descriptor (``dir_fd``), so only the last component is looked up and renaming the directory (or its
+    parents) doesn't affect the handle.
+    """
+
+    def __init__(self, path, fd=None):
+        self.path = Path(path)
+        self.fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY) if fd is None else fd
+
+    def __repr__(self):
+        return 'pth.DirHandle(%r, fd=%s)' % (string(self.path), self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fileno(self):
+        return self.fd
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def scandir(self):
+        """
+        List of ``DirEntry`` objects (their ``path`` is just the name).
+        """
+        entries = scandir(self.fd)
+        try:
+            return list(entries)
+        finally:
+            entries.close()
+
+    def list(self):
+        return os.listdir(self.fd)
+
+    def stat(self, name, follow_symlinks=True):
+        return os.stat(name, dir_fd=self.fd, follow_symlinks=follow_symlinks)
+
+    def exists(self, name):
+        try:
+            os.stat(name, dir_fd=self.fd, follow_symlinks=False)
+        except OSError:
+            return False
+        return True
+
+    def open(self, name, mode='r', buffering=-1, encoding=None, errors=None, newline=None):
+        return io.open(name, mode, buffering, encoding, errors, newline,
+                       opener=lambda name, flags: os.open(name, flags, 0o666, dir_fd=self.fd))
+
+    def opendir(self, name):
+        """
+        Handle for the subdirectory `name` (symlinks are not followed).
+        """
+        return DirHandle(
+            ospath.join(self.path, name),
+            os.open(name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW, dir_fd=self.fd)
+        )
+
+    def mkdir(self, name, mode=0o777):
+        os.mkdir(name, mode, dir_fd=self.fd)
+        _invalidate_stat(ospath.join(self.path, name))
+
+    def unlink(self, name):
+        os.unlink(name, dir_fd=self.fd)
+        _invalidate_stat(ospath.join(self.path, name))
+    remove = unlink
+
+    def rmdir(self, name):
+        os.rmdir(name, dir_fd=self.fd)
+        _invalidate_stat_tree(ospath.join(self.path, name))
+
+    def rename(self, src, dest, dest_dir=None):
+        """
+        Renames `src` to `dest`, which is relative to `dest_dir` (another :class:`DirHandle`) if given.
+        """
+        dest_dir = self if dest_dir is None else dest_dir
+        os.rename(src, dest, src_dir_fd=self.fd, dst_dir_fd=dest_dir.fd)
+        _invalidate_stat_tree(ospath.join(self.path, src), ospath.join(dest_dir.path, dest))
+
+    def chmod(self, name, mode):
+        os.chmod(name, mode, dir_fd=self.fd)
+        _invalidate_stat(ospath.join(self.path, name))
+
+    def walk(self, topdown=True):
+        """
+        Like ``os.fwalk``: yields ``(relpath, dirnames, filenames, dir_fd)`` for this directory and everything under
+        it, without following symlinks. `relpath` is ``''`` for this directory and `dir_fd` is only valid until the
+        next item.
+        """
+        for dirpath, dirnames, filenames, fd in os.fwalk(os.curdir, topdown=topdown, dir_fd=self.fd):
+            yield ospath.normpath(dirpath) if dirpath != os.curdir else '', dirnames, filenames, fd
+
+    @property
+    def tree(self):
+        for relpath, dirnames, filenames, _ in self.walk():
+            for name in dirnames + filenames:
+                yield Path(ospath.join(self.path, relpath, name))
+
+    def rmtree(self, name, workers=None, onerror=None):
+        """
+        Recursively deletes the subdirectory `name`, entirely through directory file descriptors. See
+        :meth:`Path.rmtree` for `workers` and `onerror`.
+        """
+        if onerror is None:
+            def onerror(*args):
+                raise
+        parts = [part for part in name.split(ospath.sep) if part and part != ospath.curdir]
+        if ospath.isabs(name) or not parts:
+            raise ValueError("%r is not a subdirectory name." % name)
+        # the intermediate directories are opened one by one too: only the last component goes to `_rmtree`
+        fd, opened = self.fd, []
+        try:
+            for part in parts[:-1]:
+                fd = os.open(part, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW, dir_fd=fd)
+                opened.append(fd)
+            _rmtree(ospath.join(self.path, *parts), workers, onerror, dir_fd=fd, name=parts[-1])
+        finally:
+            for fd in opened:
+                os.close(fd)
+        _invalidate_stat()
+
+
+class PurePath(Path):
+    """
+    A :class:`Path` whose lexical derivations (``name``, ``dir``, ``parts``, ``parents``, ``splitext``, joins etc) are
+    pure string operations: they never touch the filesystem and always give another :class:`PurePath`. Call
+    :meth:`resolve_kind` to get the concrete type (:class:`Path` or :class:`ZipPath`).
+    """
+
+    def __new__(cls, *parts):
+        return string.__new__(cls, ospath.join(*parts) if parts else ospath.curdir)
+
+    def _derive(self, *parts):
+        return PurePath(*parts)
+
+    def resolve_kind(self):
+        return ZipPath.from_string(self)
+
+    def __repr__(self):
+        return 'pth.PurePath(%r)' % string(self)
+
+
+class WorkingDirAlreadyActive(Exception):
+    pass
+
+
+class WorkingDir(Path):
+    previous = None
+    __in_context = False
+
+    def __cd(self):
+        if not self.isdir:
+            raise PathMustBeDirectory("%r is not a directory!" % self)
+
+        self.previous = Path(os.getcwd())
+        os.chdir(self)
+        _invalidate_stat()
+        return self
+
+    def __enter__(self):
+        if self.__in_context:
+            raise WorkingDirAlreadyActive("Already switched to %r" % self)
+        self.__in_context = True
+        return self.__cd()
+
+    def __call__(self):
+        if self.__in_context:
+            raise WorkingDirAlreadyActive("Already switched to %r" % self)
+        return self.__cd()
+
+    def __exit__(self, *exc):
+        os.chdir(self.previous)
+        _invalidate_stat()
+
+    def __repr__(self):
+        return 'pth.WorkingDir(%r)' % string(self)
+
+
+class LocalWorkingDir(Path):
+    """
+    Like :class:`WorkingDir` but without ``os.chdir``: inside the ``with`` block relative paths given to ``pth()``
+    (and ``pth.cwd``, :meth:`Path.abspath`) are resolved against this directory. The state lives in a context
+    variable (a thread local before Python 3.7) so it's isolated between threads and asyncio tasks, and contexts can
+    be nested (relative local directories are relative to the enclosing one). Paths made with ``Path()`` directly or
+    outside the block and the process' actual working directory are not affected.
+
+    The paths made by ``pth()`` keep their relative string (``name``, ``parts``, ``relpath`` etc are unchanged),
+    their methods and properties do I/O on the path joined to this directory - even after the block, and so do the
+    relative paths given to them (``copy``'s `dest`, ``rename``'s `new` ...). Results of I/O (``list``, ``tree``,
+    ``realpath``, ``rename`` ...) are absolute. Plain ``os`` calls and the module-level functions see
+    the relative string, give them ``path.abspath``.
+
+    With `opendir` the directory is held open and its :class:`DirHandle` is available as ``pth.cwd_handle``.
+    """
+
+    def __new__(cls, path, opendir=False):
+        self = super(LocalWorkingDir, cls).__new__(cls, path)
+        self.__opendir = opendir
+        return self
+
+    def __enter__(self):
+        path = _abspath(self)
+        if not ospath.isdir(path):
+            raise PathMustBeDirectory("%r is not a directory!" % self)
+        handle = DirHandle(path) if self.__opendir else None
+        _set_local_dirs(_get_local_dirs() + ((path, handle),))
+        return Path(path)
+
+    def __exit__(self, *exc):
+        stack = _get_local_dirs()
+        _set_local_dirs(stack[:-1])
+        if stack[-1][1] is not None:
+            stack[-1][1].close()
+
+    def __repr__(self):
+        return 'pth.LocalWorkingDir(%r)' % string(self)
+
+
+class ZipIndex(object):
+    """
+    Directory tree of an archive's members, built once from the central directory and shared by all the
+    :class:`ZipPath` objects using the same ``ZipFile``. Directories without an explicit entry in the archive are
+    included.
+
+    Keys are normalized member names without the trailing slash (``''`` is the root).
+    """
+    __instances = weakref.WeakKeyDictionary()
+    __lock = threading.Lock()
+
+    def __init__(self, zipobj):
+        self.children = {'': OrderedDict()}
+        self.files = set()
+        for name in zipobj.namelist():
+            parts = [part for part in name.split('/') if part]
+            if not parts:
+                continue
+            parent = ''
+            for i, part in enumerate(parts, 1):
+                key = '/'.join(parts[:i])
+                if i == len(parts) and not name.endswith('/'):
+                    self.files.add(key)
+                    self.children[parent].setdefault(part, name)
+                else:
+                    if key not in self.children:
+                        self.children[key] = OrderedDict()
+                    if i == len(parts):
+                        self.children[parent][part] = name
+                    else:
+                        self.children[parent].setdefault(part, key + '/')
+                parent = key
+
+    @classmethod
+    def of(cls, zipobj):
+        with cls.__lock:
+            try:
+                return cls.__instances[zipobj]
+            except KeyError:
+                index = cls.__instances[zipobj] = cls(zipobj)
+                return index
+
+    @staticmethod
+    def key(relpath):
+        key = posixpath.normpath(relpath.replace(ospath.sep, '/')).strip('/')
+        return '' if key == '.' else key
+
+    def isdir(self, key):
+        return key in self.children
+
+    def isfile(self, key):
+        return key in self.files
+
+    def list(self, key):
+        return self.children[key].values()
+
+    def tree(self, key):
+        for name in self.children[key].values():
+            yield name
+            child = name.rstrip('/')
+            if child in self.children:
+                for i in self.tree(child):
+                    yield i
+
+
+def _iter_lines(chunks, encoding, errors, keepends):
+    if encoding is None:
+        newline, empty = b'\n', b''
+    else:
+        newline, empty = u'\n', u''
+        decoder = codecs.getincrementaldecoder(encoding)(errors)
+    # pieces of the pending line, only joined once its newline shows up (a long line isn't copied per chunk)
+    pending = []
+    for chunk in chunks:
+        if encoding is not None:
+            chunk = decoder.decode(chunk)
+        if newline not in chunk:
+            if chunk:
+                pending.append(chunk)
+            continue
+        lines = chunk.split(newline)
+        if pending:
+            pending.append(lines[0])
+            lines[0] = empty.join(pending)
+        tail = lines.pop()
+        pending = [tail] if tail else []
+        for line in lines:
+            yield line + newline if keepends else line
+    if encoding is not None:
+        pending.append(decoder.decode(b'', True))
+    tail = empty.join(pending)
+    if tail:
+        yield tail
+
+
+def _byte_view(buffer, length=None):
+    view = memoryview(buffer)
+    if view.readonly:
+        raise TypeError("%r is not a writable buffer" % type(buffer))
+    if view.itemsize != 1 or view.ndim != 1:
+        view = view.cast('B')
+    if length is not None:
+        view = view[:length]
+    return view
+
+
+def _readinto_fd(fd, view, offset, pread):
+    total = 0
+    while total < len(view):
+        size = pread(fd, view[total:], offset + total)
+        if not size:
+            break
+        total += size
+    return total
+
+
+def _readinto_fh(fh, view):
+    total = 0
+    while total < len(view):
+        size = fh.readinto(view[total:])
+        if not size:
+            break
+        total += size
+    return total
+
+
+_zip_local_header = struct.Struct(zipfile.structFileHeader)
+_zip_mappings = weakref.WeakKeyDictionary()
+_zip_mappings_lock = threading.Lock()
+
+
+def _map(func, items, workers=None):
+    if workers and futures is not None:
+        with futures.ThreadPoolExecutor(workers) as executor:
+            return list(executor.map(func, items))
+    else:
+        return [func(item) for item in items]
+
+
+def _map_recursive(func, item, children, workers=None):
+    """
+    Yields ``func(item)`` and recursively ``func`` of every ``children(result)``, breadth first or, with
+    `workers`, as soon as each result is ready.
+    """
+    if workers and futures is not None:
+        with futures.ThreadPoolExecutor(workers) as executor:
+            running = set([executor.submit(func, item)])
+            while running:
+                done, running = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    yield result
+                    running.update(executor.submit(func, child) for child in children(result))
+    else:
+        todo = [item]
+        for item in todo:
+            result = func(item)
+            yield result
+            todo.extend(children(result))
+
+
+def _zip_inflate_into(fd, zi, view, offset):
+    # max_length bounds every decompressed piece to CHUNK_SIZE, whatever the compression ratio
+    position = _zip_data_offset(fd, zi)
+    end = position + zi.compress_size
+    decompressor = zlib.decompressobj(-15)
+    total = 0
+    while total < len(view):
+        if decompressor.unconsumed_tail:
+            data = decompressor.decompress(decompressor.unconsumed_tail, CHUNK_SIZE)
+        elif position < end:
+            raw = os.pread(fd, min(CHUNK_SIZE, end - position), position)
+            if not raw:
+                raise zipfile.BadZipfile("Truncated data for file %r" % zi.filename)
+            position += len(raw)
+            data = decompressor.decompress(raw, CHUNK_SIZE)
+        else:
+            data = decompressor.flush()
+            if not data:
+                break
+        data = memoryview(data)
+        if offset:
+            skip = min(offset, len(data))
+            offset -= skip
+            data = data[skip:]
+        size = min(len(data), len(view) - total)
+        view[total:total + size] = data[:size]
+        total += size
+    return total
+
+
+def _zip_data_offset(fd, zi):
+    header = os.pread(fd, _zip_local_header.size, zi.header_offset)
+    fields = _zip_local_header.unpack(header)
+    if fields[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipfile("Bad magic number for file header of %r" % zi.filename)
+    return zi.header_offset + _zip_local_header.size + fields[-2] + fields[-1]
+
+
+class _ZipReader(object):
+    """
+    Reads members concurrently: stored and deflated members are read with ``os.pread`` on a shared descriptor and
+    decompressed with ``zlib`` (which releases the GIL); the others go through a ``ZipFile`` opened per thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0)) if hasattr(os, 'pread') else None
+        self.local = threading.local()
+        self.handles = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            os.close(self.fd)
+        for zipobj in self.handles:
+            zipobj.close()
+
+    def chunks(self, zi):
+        if (
+            self.fd is not None and not zi.flag_bits & 0x1 and
+            zi.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+        ):
+            return self.__pread_chunks(zi)
+        else:
+            return self.__zipfile_chunks(zi)
+
+    def __pread_chunks(self, zi):
+        offset = _zip_data_offset(self.fd, zi)
+        end = offset + zi.compress_size
+        decompressor = zlib.decompressobj(-15) if zi.compress_type == zipfile.ZIP_DEFLATED else None
+        crc = 0
+        while offset < end:
+            raw = os.pread(self.fd, min(CHUNK_SIZE, end - offset), offset)
+            if not raw:
+                raise zipfile.BadZipfile("Truncated data for file %r" % zi.filename)
+            offset += len(raw)
+            data = raw if decompressor is None else decompressor.decompress(raw)
+            crc = zlib.crc32(data, crc)
+            yield data
+        if decompressor is not None:
+            data = decompressor.flush()
+            crc = zlib.crc32(data, crc)
+            yield data
+        if crc & 0xffffffff != zi.CRC:
+            raise zipfile.BadZipfile("Bad CRC-32 for file %r" % zi.filename)
+
+    def __zipfile_chunks(self, zi):
+        zipobj = getattr(self.local, 'zipobj', None)
+        if zipobj is None:
+            zipobj = self.local.zipobj = zipfile.ZipFile(self.path)
+            self.handles.append(zipobj)
+        with zipobj.open(zi.filename) as fh:
+            while True:
+                chunk = fh.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+
+def _zip_mapping(path, zipobj):
+    # one readonly mapping per ZipFile, shared by all its members
+    with _zip_mappings_lock:
+        try:
+            return _zip_mappings[zipobj]
+        except KeyError:
+            mapping = _zip_mappings[zipobj] = Path(path).mmap()
+            return mapping
+
+
+class ZipPath(AbstractPath):
 
     @property
     def abspath(self):
         return ZipPath(
-            ospath.abspath(self._ZipPath__zippath),
+            _abspath(_target(self._ZipPath__zippath)),
             self._ZipPath__zipobj,
             self._ZipPath__relpath,
         )
@@ -578,19 +3479,11 @@ class ZipPath(AbstractPath):
 
     @property
     def exists(self):
-        if not ospath.exists(self.__zippath):
+        if not ospath.exists(_target(self.__zippath)):
             return False
-        path = self.__relpath.rstrip(ospath.sep)
-        if not path:
-            return True
-        try:
-            self.__zipinfo(posixpath.normpath(path))
-        except KeyError:
-            try:
-                self.__zipinfo(posixpath.normpath(path))
-            except KeyError:
-                return False
-        return True
+        key = ZipIndex.key(self.__relpath)
+        index = ZipIndex.of(self.__zipobj)
+        return index.isdir(key) or index.isfile(key)
 
     @property
     def expanduser(self):
@@ -650,27 +3543,11 @@ class ZipPath(AbstractPath):
 
     @property
     def isdir(self):
-        path = self.__relpath.rstrip(ospath.sep)
-        if not path:
-            return True
-        try:
-            self.__zipinfo(posixpath.normpath(path) + '/')
-        except KeyError:
-            return False
-        else:
-            return True
+        return ZipIndex.of(self.__zipobj).isdir(ZipIndex.key(self.__relpath))
 
     @property
     def isfile(self):
-        path = self.__relpath.rstrip(ospath.sep)
-        if not path:
-            return False
-        try:
-            self.__zipinfo(posixpath.normpath(path))
-        except KeyError:
-            return False
-        else:
-            return True
+        return ZipIndex.of(self.__zipobj).isfile(ZipIndex.key(self.__relpath))
 
     @property
     def islink(self):
@@ -714,7 +3591,7 @@ class ZipPath(AbstractPath):
     @property
     def realpath(self):
         return ZipPath(
-            ospath.realpath(self._ZipPath__zippath),
+            ospath.realpath(_target(self._ZipPath__zippath)),
             self._ZipPath__zipobj,
             self._ZipPath__relpath,
         )
@@ -747,15 +3624,29 @@ class ZipPath(AbstractPath):
     extsplit = splitext
 
     def __new__(cls, path, zipobj=None, relpath=""):
-        if not zipfile.is_zipfile(path):
-            return pth(ospath.join(path, relpath).rstrip(ospath.sep))
+        if not zipcache(_target(path)):
+            base = getattr(path, '_base', None)
+            path = ospath.join(path, relpath).rstrip(ospath.sep)
+            return pth(path) if base is None else _make_path(path, base)
         obj = string.__new__(cls, ospath.join(path, relpath).rstrip(ospath.sep))
+        if zipobj is None:
+            zipobj = zippool.acquire(_target(path))
+            obj.__pooled = not zippool.watch(obj, zipobj)
+        elif zippool.retain(zipobj):
+            obj.__pooled = not zippool.watch(obj, zipobj)
         obj.__zippath = path
-        obj.__zipobj = zipfile.ZipFile(path) if zipobj is None else zipobj
+        obj.__zipobj = zipobj
         obj.__relpath = relpath
         obj.__zipinfo = obj.__zipobj.getinfo
         return obj
 
+    # set when the pool couldn't watch this object: the reference on the ZipFile is released here instead
+    __pooled = False
+
+    def __del__(self):
+        if self.__pooled and zippool is not None:
+            zippool.release(self.__zipobj)
+
     @classmethod
     def from_string(cls, string):
         path = pth(string)
@@ -768,7 +3659,7 @@ class ZipPath(AbstractPath):
         tails.reverse()
         if tails:
             if isinstance(lead, ZipPath):
-                return ZipPath(lead.__zippath, lead.__zipobj, ospath.join(*tails))
+                return ZipPath(lead.__zippath, lead.__zipobj, str(ospath.join(*tails)))
             else:
                 return path
         else:
@@ -782,19 +3673,16 @@ class ZipPath(AbstractPath):
         if not self.isdir:
             raise PathMustBeDirectory("%r is not a directory!" % self)
 
-        for name in self.__zipobj.namelist():
-            if name.startswith(self.__relpath):
-                yield ZipPath(self.__zippath, self.__zipobj, name)
+        for name in ZipIndex.of(self.__zipobj).tree(ZipIndex.key(self.__relpath)):
+            yield ZipPath(self.__zippath, self.__zipobj, name)
 
     @property
     def list(self):
         if not self.isdir:
             raise PathMustBeDirectory("%r is not a directory!" % self)
 
-        for name in self.__zipobj.namelist():
-            if name.startswith(self.__relpath):
-                if '/' not in name[len(self.__relpath):].strip('/'):
-                    yield ZipPath(self.__zippath, self.__zipobj, name)
+        for name in ZipIndex.of(self.__zipobj).list(ZipIndex.key(self.__relpath)):
+            yield ZipPath(self.__zippath, self.__zipobj, name)
 
     def __call__(self, *open_args, **open_kwargs):
         if self.isfile:
@@ -802,29 +3690,296 @@ class ZipPath(AbstractPath):
         else:
             raise PathMustBeFile("%r is not a file !" % self)
 
+    def read_bytes(self):
+        if not self.isfile:
+            raise PathMustBeFile("%r is not a file !" % self)
+        return self.__zipobj.read(self.__zipinfo(self.__relpath))
+
+    def read_text(self, encoding=None, errors=None):
+        with io.TextIOWrapper(self('r'), encoding=encoding, errors=errors) as fh:
+            return fh.read()
+
+    def readinto(self, buffer, offset=0, length=None):
+        """
+        Read the member, starting at `offset` in the uncompressed data, into the writable `buffer` (up to
+        `length` bytes or the buffer's size). Returns the number of bytes read.
+
+        Stored members are copied straight from the memory-mapped archive. Deflated members are read with
+        ``os.pread`` and decompressed by bounded chunks into the buffer (the bytes before `offset` still have to
+        be decompressed, but are not kept). Others go through ``ZipFile.open``.
+        """
+        view = _byte_view(buffer, length)
+        if not self.isfile:
+            raise PathMustBeFile("%r is not a file !" % self)
+        zi = self.__zipinfo(self.__relpath)
+        if zi.compress_type == zipfile.ZIP_STORED and not zi.flag_bits & 0x1:
+            data = self.mmap()[offset:offset + len(view)]
+            view[:len(data)] = data
+            return len(data)
+        if zi.compress_type == zipfile.ZIP_DEFLATED and not zi.flag_bits & 0x1 and hasattr(os, 'pread'):
+            fd = os.open(_target(self.__zippath), os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+            try:
+                return _zip_inflate_into(fd, zi, view, offset)
+            finally:
+                os.close(fd)
+        with self.__zipobj.open(zi) as fh:
+            if offset:
+                if hasattr(fh, 'seekable') and fh.seekable():
+                    fh.seek(offset)
+                else:
+                    while offset:
+                        skipped = len(fh.read(min(offset, COPY_BUFFER_SIZE)))
+                        if not skipped:
+                            return 0
+                        offset -= skipped
+            return _readinto_fh(fh, view)
+
+    def hash(self, algo='sha256', cache=None):
+        """
+        Hex digest of the member's contents. ``'crc32'`` is taken from the central directory without reading
+        anything; other ``hashlib`` algorithms are computed by streaming the member (`cache` is not used).
+        """
+        if not self.isfile:
+            raise PathMustBeFile("%r is not a file !" % self)
+        if algo == 'crc32':
+            return '%08x' % self.__zipinfo(self.__relpath).CRC
+        hasher = hashlib.new(algo)
+        for chunk in self.iter_chunks():
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def iter_chunks(self, size=CHUNK_SIZE, offset=0, length=None):
+        """
+        Stream the member's uncompressed data as chunks of `size` bytes, starting at `offset`, for `length` bytes
+        (or until the end).
+        """
+        if not self.isfile:
+            raise PathMustBeFile("%r is not a file !" % self)
+        with self.__zipobj.open(self.__zipinfo(self.__relpath)) as fh:
+            if offset:
+                if hasattr(fh, 'seekable') and fh.seekable():
+                    fh.seek(offset)
+                else:
+                    while offset:
+                        offset -= len(fh.read(min(offset, size)))
+            remaining = length
+            while remaining is None or remaining > 0:
+                chunk = fh.read(size if remaining is None else min(size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def iter_lines(self, encoding=None, errors='strict', keepends=True, size=CHUNK_SIZE, **kwargs):
+        """
+        Stream the member's lines (split on ``\\n``), as bytes or as text if an `encoding` is given. Other arguments
+        are passed to :meth:`iter_chunks`.
+        """
+        return _iter_lines(self.iter_chunks(size, **kwargs), encoding, errors, keepends)
+
+    def __infos(self, members):
+        if members is None:
+            return [self.__zipinfo(path.__relpath) for path in self.tree if path.isfile]
+        infos = []
+        for member in members:
+            if isinstance(member, ZipPath):
+                relpath = member.__relpath
+            else:
+                relpath = posixpath.join(self.__relpath, member)
+            try:
+                infos.append(self.__zipinfo(ZipIndex.key(relpath)))
+            except KeyError:
+                raise PathMustBeFile("%r is not a file !" % ZipPath(self.__zippath, self.__zipobj, relpath))
+        return infos
+
+    def read_many(self, members=None, workers=None):
+        """
+        Read the given `members` (paths or names relative to this one), or all the files under this path. Returns
+        a list of bytes, in the same order.
+
+        The members are decompressed on `workers` threads, each reading the archive through positional reads (or
+        its own handle) so they don't contend on the shared ``ZipFile``.
+        """
+        infos = self.__infos(members)
+        with _ZipReader(_target(self.__zippath)) as reader:
+            return _map(lambda zi: b''.join(reader.chunks(zi)), infos, workers)
+
+    def extract(self, dest, workers=None):
+        """
+        Extract this member (or all the files under this directory) into the `dest` directory, decompressing on
+        `workers` threads. Unsafe names (absolute, with ``..`` components) are sanitized like ``ZipFile.extract``
+        does. Returns `dest`.
+        """
+        dest = Path(dest)
+        if self.isfile:
+            base = posixpath.dirname(ZipIndex.key(self.__relpath))
+        else:
+            base = ZipIndex.key(self.__relpath)
+
+        def target_of(name):
+            parts = [part for part in name[len(base):].split('/') if part not in ('', '.', '..')]
+            return Path(ospath.join(dest, *parts))
+
+        infos = self.__infos(None if self.isdir else [self])
+        targets = [target_of(zi.filename) for zi in infos]
+        dirs = set(ospath.dirname(target) for target in targets)
+        if self.isdir:
+            dirs.add(string(dest))
+            dirs.update(string(target_of(path.__relpath)) for path in self.tree if path.isdir)
+        for target in dirs:
+            if not ospath.isdir(target):
+                os.makedirs(target)
+
+        def extract(args):
+            zi, target = args
+            with io.open(target, 'wb') as fh:
+                for chunk in reader.chunks(zi):
+                    fh.write(chunk)
+
+        with _ZipReader(_target(self.__zippath)) as reader:
+            _map(extract, zip(infos, targets), workers)
+        _invalidate_stat()
+        return dest
+
+    def glob(self, pattern):
+        """
+        Like :meth:`Path.glob` but matched against the archive's directory index, nothing is read from disk.
+        """
+        if not isinstance(pattern, GlobPattern):
+            pattern = GlobPattern(pattern)
+        index = ZipIndex.of(self.__zipobj)
+
+        def scan(key):
+            if not index.isdir(key):
+                return []
+            return [
+                (name, index.isdir(child), False, None)
+                for name, child in ((name, ZipIndex.key(member)) for name, member in index.children[key].items())
+            ]
+
+        def kind(key):
+            if index.isdir(key):
+                return True
+            elif index.isfile(key):
+                return False
+
+        def join(key, name):
+            return key + '/' + name if key else name
+
+        for key, _ in pattern.walk(ZipIndex.key(self.__relpath), scan, kind, join):
+            yield ZipPath(self.__zippath, self.__zipobj, key)
+
+    def rglob(self, pattern):
+        return self.glob('**/' + pattern)
+
+    def disk_usage(self, apparent=False, workers=None, max_depth=None):
+        """
+        Like :meth:`Path.disk_usage` but computed from the central directory: sizes are the compressed sizes, or the
+        uncompressed ones if `apparent` is true. Nothing is decompressed, `workers` is accepted for compatibility
+        and ignored.
+        """
+        if not self.isdir:
+            raise PathMustBeDirectory("%r is not a directory!" % self)
+        index = ZipIndex.of(self.__zipobj)
+        base = ZipIndex.key(self.__relpath)
+        prefix = base + '/' if base else ''
+        totals = {base: 0}
+        for zi in self.__zipobj.infolist():
+            key = ZipIndex.key(zi.filename)
+            if not key.startswith(prefix) or not index.isfile(key):
+                continue
+            size = zi.file_size if apparent else zi.compress_size
+            parent = posixpath.dirname(key)
+            while True:
+                totals[parent] = totals.get(parent, 0) + size
+                if parent == base:
+                    break
+                parent = posixpath.dirname(parent)
+        for name in index.tree(base):
+            key = ZipIndex.key(name)
+            if index.isdir(key):
+                totals.setdefault(key, 0)
+
+        def depth(key):
+            return key[len(prefix):].count('/') + 1 if key != base else 0
+
+        usage = OrderedDict()
+        for key in sorted(totals, key=lambda key: (-depth(key), key)):
+            if max_depth is None or depth(key) <= max_depth:
+                usage[ZipPath(self.__zippath, self.__zipobj, key)] = totals[key]
+        return usage
+
+    def mmap(self):
+        """
+        Returns a readonly ``memoryview`` of the member's contents. For members stored without compression (and
+        not encrypted) this is a view straight into the memory-mapped archive, no data is copied. Other members are
+        decompressed into memory.
+        """
+        if not self.isfile:
+            raise PathMustBeFile("%r is not a file !" % self)
+        zi = self.__zipinfo(self.__relpath)
+        if zi.compress_type != zipfile.ZIP_STORED or zi.flag_bits & 0x1 or not zi.file_size:
+            with self.__zipobj.open(zi) as fh:
+                return memoryview(fh.read())
+        mapping = _zip_mapping(_target(self.__zippath), self.__zipobj)
+        header = mapping[zi.header_offset:zi.header_offset + _zip_local_header.size]
+        fields = _zip_local_header.unpack(header)
+        if fields[0] != zipfile.stringFileHeader:
+            raise zipfile.BadZipfile("Bad magic number for file header of %r" % self)
+        start = zi.header_offset + _zip_local_header.size + fields[-2] + fields[-1]
+        if not PY3:
+            # Python 2's mmap objects don't have the buffer interface memoryview needs, slicing copies
+            return memoryview(mapping[start:start + zi.file_size])
+        return memoryview(mapping)[start:start + zi.file_size]
+
 
 class TempPath(Path):
-    def __new__(cls, **mkdtemp_kwargs):
-        return string.__new__(cls, tempfile.mkdtemp(**mkdtemp_kwargs))
+    def __new__(cls, rmtree_workers=None, rmtree_background=False, **mkdtemp_kwargs):
+        obj = string.__new__(cls, tempfile.mkdtemp(**mkdtemp_kwargs))
+        obj.rmtree_workers = rmtree_workers
+        obj.rmtree_background = rmtree_background
+        return obj
 
     def __enter__(self):
         return self
 
     def __exit__(self, tt=None, tv=None, tb=None):
-        shutil.rmtree(str(self))
+        self.rmtree(workers=self.rmtree_workers, background=self.rmtree_background)
 
     def __repr__(self):
         return '<TempPath %s>' % super(Path, self).__repr__()
 
 pth.Path = Path
+pth.PurePath = pth.pure = PurePath
 pth.ZipPath = pth.zip = ZipPath
 pth.TempPath = pth.tmp = TempPath
 pth.WorkingDir = pth.wd = WorkingDir
 pth.WorkingDirAlreadyActive = WorkingDirAlreadyActive
+pth.LocalWorkingDir = pth.lwd = LocalWorkingDir
 pth.PathError = PathError
 pth.PathMustBeFile = PathMustBeFile
 pth.PathMustBeDirectory = PathMustBeDirectory
 pth.PathDoesNotExist = PathDoesNotExist
+pth.ZipCheckCache = ZipCheckCache
+pth.zipcache = zipcache
+pth.ZipFilePool = ZipFilePool
+pth.zippool = zippool
+pth.StatCache = pth.stat_cache = StatCache
+pth.StatArrays = StatArrays
+pth.stat_many = stat_many
+pth.HashCache = HashCache
+pth.hash_many = hash_many
+pth.find_duplicates = find_duplicates
+pth.GlobPattern = GlobPattern
+pth.Watcher = Watcher
+pth.WatchEvent = WatchEvent
+pth.Snapshot = Snapshot
+pth.SnapshotDiff = SnapshotDiff
+pth.AIO = AIO
+pth.AsyncPath = AsyncPath
+pth.aio = aio
+pth.DirHandle = DirHandle
 pth.__name__ = __name__
 pth.__file__ = __file__
 pth.__package__ = __package__
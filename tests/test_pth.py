@@ -3,9 +3,15 @@
 import os
 import sys
 import zipfile
+import zlib
+import hashlib
+import mmap
 import io
 import errno
+import shutil
 import stat
+import threading
+import time
 
 import pytest
 from fields import Namespace
@@ -807,3 +813,1414 @@ def test_normpath():
 
 def test_join_zippath_abs():
     assert pth('tests/files/test.zip') / '/etc' == '/etc'
+
+
+def test_zipcache(monkeypatch):
+    calls = []
+    is_zipfile = zipfile.is_zipfile
+    monkeypatch.setattr(zipfile, 'is_zipfile', lambda path: calls.append(path) or is_zipfile(path))
+    cache = pth.ZipCheckCache(maxsize=1)
+    assert cache('tests/files/test.zip')
+    assert cache('tests/files/test.zip')
+    assert len(calls) == 1
+    assert not cache('tests/files/b.txt')  # too small to be an archive
+    assert not cache('tests/files')
+    assert not cache('bogus-doesnt-exist')
+    assert len(calls) == 1
+
+    cache.invalidate('tests/files/test.zip')
+    assert cache('tests/files/test.zip')
+    assert len(calls) == 2
+    assert not cache('tests/files/trîcky-năme')
+    assert len(cache) == 1
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_zipcache_no_skip():
+    cache = pth.ZipCheckCache(skip_obvious=False)
+    assert not cache('tests/files/b.txt')
+    assert not cache('bogus-doesnt-exist')
+    assert len(cache) == 1
+
+
+def test_pure(monkeypatch):
+    def zipcache(path):
+        raise AssertionError("Unexpected zip check for %r" % path)
+    monkeypatch.setattr(pth.__mod, 'zipcache', zipcache)
+    p = pth.pure('tests', 'files', 'test.zip', 'a.txt')
+    assert repr(p) == "pth.PurePath(%r)" % os.path.join('tests', 'files', 'test.zip', 'a.txt')
+    for derived in [
+        p.name, p.dir, p.splitpath[0], p.splitpath[1], p.splitext[0], p / 'b', p.normpath, p.abs, p.rel('tests'),
+    ] + p.parts + p.parents:
+        assert isinstance(derived, pth.PurePath)
+    assert p.dir == os.path.join('tests', 'files', 'test.zip')
+    assert p.parts == ['tests', 'files', 'test.zip', 'a.txt']
+    assert isinstance(pth.pure(), pth.PurePath)
+    assert pth.pure() == os.curdir
+
+
+def test_pure_resolve_kind():
+    p = pth.pure('tests', 'files', 'test.zip', 'a.txt')
+    assert isinstance(p.dir.resolve_kind(), pth.ZipPath)
+    assert type(p.dir.dir.resolve_kind()) is pth.Path
+    member = p.resolve_kind()
+    assert isinstance(member, pth.ZipPath)
+    assert member == pth('tests', 'files', 'test.zip') / 'a.txt'
+    assert member.read_bytes() == (pth('tests', 'files', 'test.zip') / 'a.txt').read_bytes()
+    assert isinstance(pth.pure('tests', 'files', 'test.zip', '1', '1.txt').resolve_kind(), pth.ZipPath)
+    # a ZipPath has no pure mode: its pure counterpart is the plain string, the archive is found again when resolved
+    zp = pth('tests', 'files', 'test.zip') / 'a.txt'
+    assert type(pth.pure(zp)) is pth.PurePath
+    assert isinstance(pth.pure(zp).resolve_kind(), pth.ZipPath)
+    assert type(pth.pure('tests', 'files', 'missing.txt').resolve_kind()) is pth.Path
+
+
+@pytest.mark.skipif(pth.__mod.scandir is None, reason="no scandir")
+def test_list_direntry(monkeypatch):
+    children = dict((str(p.name), p) for p in pth('tests', 'files').list)
+    monkeypatch.setattr(os.path, 'isdir', None)
+    monkeypatch.setattr(os.path, 'isfile', None)
+    monkeypatch.setattr(os.path, 'islink', None)
+    assert children['a'].isdir
+    assert not children['a'].isfile
+    assert children['b.txt'].isfile
+    assert not children['b.txt'].isdir
+    assert not children['b.txt'].islink
+    assert isinstance(children['test.zip'], pth.ZipPath)
+    assert children['test.zip'].isdir
+    assert sorted(children['a'].files) == [pth('tests', 'files', 'a', 'a.txt')]
+    assert not (children['a'] / 'a.txt')._direntry
+
+
+def test_list_direntry_reset():
+    with pth.tmp() as tmp:
+        for name in 'abcdef':
+            (tmp / name)('w').close()
+        (tmp / 'dir').mkdir()
+        children = dict((str(p.name), p) for p in tmp.list)
+        assert all(child._direntry for child in children.values())
+
+        children['a'].unlink()
+        assert not children['a'].exists
+        assert not children['a'].isfile
+        children['b'].rename(tmp / 'moved')
+        assert not children['b'].isfile
+        if hasattr(os, 'replace'):
+            children['c'].replace(tmp / 'moved')
+        else:
+            children['c'].rename(tmp / 'moved')
+        assert not children['c'].isfile
+        children['d'].chmod(0o600)
+        assert stat.S_IMODE(children['d'].stat.st_mode) == 0o600
+        assert children['d']._direntry is None
+        with children['e']('w') as fh:
+            fh.write(u'data')
+        assert children['e'].size == 4
+        if hasattr(os, 'truncate'):
+            children['e'].truncate(1)
+            assert children['e'].size == 1
+        children['dir'].rmdir()
+        assert not children['dir'].isdir
+        assert children['f']._direntry is not None
+
+
+def test_tree_workers():
+    expected = list(pth('tests').tree)
+    assert list(pth('tests').tree(workers=4)) == expected
+    assert list(pth('tests').tree(workers=4, max_pending=1)) == expected
+    assert sorted(pth('tests').tree(workers=4, order='unordered')) == sorted(expected)
+    raises(pth.PathMustBeDirectory, next, pth('bogus-doesnt-exist').tree(workers=2))
+    raises(ValueError, pth('tests').tree, workers=2, order='bogus')
+    raises(ValueError, pth('tests').tree, order='bogus')
+
+
+def test_zip_implicit_dirs():
+    with pth.tmp() as tmp:
+        with zipfile.ZipFile(tmp / 'implicit.zip', 'w') as zf:
+            zf.writestr('x/y/z.txt', 'z')
+            zf.writestr('x/a.txt', 'a')
+            zf.writestr('xa.txt', 'xa')
+        zp = pth(tmp, 'implicit.zip')
+        assert (zp / 'x').isdir
+        assert (zp / 'x' / 'y').isdir
+        assert (zp / 'x' / 'y').exists
+        assert not (zp / 'x' / 'y').isfile
+        assert (zp / 'x' / 'y' / 'z.txt').isfile
+        assert not (zp / 'x' / 'b').exists
+        assert sorted(zp.list) == [zp / 'x', zp / 'xa.txt']
+        assert sorted((zp / 'x').list) == [zp / 'x' / 'a.txt', zp / 'x' / 'y']
+        assert sorted((zp / 'x').tree) == [zp / 'x' / 'a.txt', zp / 'x' / 'y', zp / 'x' / 'y' / 'z.txt']
+        assert all(isinstance(p, pth.ZipPath) for p in zp.tree)
+        raises(pth.PathMustBeDirectory, next, (zp / 'xa.txt').list)
+
+
+def test_zip_list():
+    zp = pth('tests', 'files', 'test.zip')
+    assert sorted(zp.list) == [zp / '1', zp / 'B.TXT', zp / 'a.txt']
+    assert list((zp / '1').list) == [zp / '1' / '1.txt']
+
+
+def test_zippool():
+    pool = pth.ZipFilePool(maxsize=1)
+    zipobj = pool.acquire('tests/files/test.zip')
+    assert pool.acquire(pth('tests', 'files', 'test.zip').abs) is zipobj
+    assert len(pool) == 1
+    with pth.tmp() as tmp:
+        other = pth.Path('tests/files/test.zip').copy(tmp / 'other.zip')
+        otherobj = pool.acquire(other)
+        assert len(pool) == 2  # both in use
+        pool.release(zipobj)
+        assert len(pool) == 2
+        pool.release(zipobj)
+        assert len(pool) == 1
+        assert zipobj.fp is None
+        assert not pool.retain(zipobj)
+        assert pool.retain(otherobj)
+        pool.release(otherobj)
+        pool.release(otherobj)
+        pool.close()
+        assert len(pool) == 0
+        assert otherobj.fp is None
+
+
+def test_zippool_zippath():
+    with pth.tmp() as tmp:
+        pth.Path('tests/files/test.zip').copy(tmp / 'pooled.zip')
+        handles = len(pth.zippool)
+        zp = pth(tmp, 'pooled.zip')
+        assert len(pth.zippool) == handles + 1
+        member = zp / 'a.txt'
+        pth.ZipPath(tmp / 'pooled.zip') / '1' / '1.txt'
+        assert len(pth.zippool) == handles + 1
+        zipobj = member._ZipPath__zipobj
+        assert zipobj is zp._ZipPath__zipobj
+        del zp
+        pth.zippool.close()
+        assert zipobj.fp is not None
+        with member('r') as fh:
+            assert fh.read() == b"A"
+        del member
+        pth.zippool.close()
+        assert zipobj.fp is None
+
+
+def test_zippool_without_weakrefs(monkeypatch):
+    # str subclasses can't be weakly referenced on Python 2
+    class weakref(object):
+        @staticmethod
+        def ref(obj, callback):
+            raise TypeError("cannot create weak reference to %r object" % type(obj).__name__)
+    monkeypatch.setattr(pth.__mod, 'weakref', weakref)
+    with pth.tmp() as tmp:
+        pth.Path('tests/files/test.zip').copy(tmp / 'pooled.zip')
+        zp = pth(tmp, 'pooled.zip')
+        zipobj = zp._ZipPath__zipobj
+        member = zp / 'a.txt'
+        with member('r') as fh:
+            assert fh.read() == b"A"
+        del zp
+        pth.zippool.close()
+        assert zipobj.fp is not None
+        del member, fh
+        pth.zippool.close()
+        assert zipobj.fp is None
+
+
+def test_stat_cache(monkeypatch):
+    calls = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, 'stat', lambda path, *args, **kwargs: calls.append(path) or real_stat(path, *args, **kwargs))
+    p = pth('tests', 'files', 'b.txt')
+    del calls[:]
+    with pth.stat_cache() as cache:
+        assert p.exists
+        assert p.isfile
+        assert not p.isdir
+        assert p.size == 1
+        assert isinstance(p.mtime, float)
+        assert isinstance(p.atime, float)
+        assert isinstance(p.ctime, float)
+        assert not pth('bogus-doesnt-exist').exists
+        assert not pth('bogus-doesnt-exist').exists
+        raises(OSError, lambda: pth('bogus-doesnt-exist').size)
+        assert len(calls) == 2
+        assert len(cache) == 2
+    assert p.exists
+    assert len(calls) == 3
+
+
+def test_stat_cache_invalidate():
+    with pth.tmp() as tmp:
+        p = tmp / 'foo'
+        with pth.stat_cache(maxsize=1) as cache:
+            assert not p.exists
+            with p('w') as fh:
+                fh.write(u'foo')
+            assert p.exists  # opened for writing through pth
+            assert p.size == 3
+            with io.open(p, 'a') as fh:
+                fh.write(u'bar')
+            assert p.size == 3  # not done through pth
+            cache.invalidate(p)
+            assert p.size == 6
+            if hasattr(os, 'truncate'):
+                p.truncate(1)
+                assert p.size == 1
+            p.utime((1, 1))
+            assert p.mtime == 1
+            q = p.rename(tmp / 'bar')
+            assert not p.exists
+            assert q.exists
+            assert len(cache) == 1
+            q.unlink()
+            assert not q.exists
+
+
+def test_stat_cache_directory_rename():
+    with pth.tmp() as tmp:
+        (tmp / 'd').mkdir()
+        (tmp / 'd' / 'c')('w').close()
+        (tmp / 'gone').mkdir()
+        with pth.stat_cache() as cache:
+            assert (tmp / 'd' / 'c').exists
+            assert (tmp / 'gone').isdir
+            assert (tmp / 'unrelated').exists is False
+            (tmp / 'd').rename(tmp / 'e')
+            assert not (tmp / 'd' / 'c').exists
+            assert (tmp / 'e' / 'c').exists
+            if hasattr(os, 'replace'):
+                (tmp / 'e').replace(tmp / 'f')
+            else:
+                (tmp / 'e').rename(tmp / 'f')
+            assert not (tmp / 'e' / 'c').exists
+            (tmp / 'gone').rmdir()
+            assert not (tmp / 'gone').isdir
+            assert (tmp / 'f' / 'c').exists
+            size = len(cache)
+            cache.invalidate(tmp / 'f', recursive=True)
+            assert len(cache) == size - 2  # f and f/c
+
+
+def test_stat_cache_ttl(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(pth.__mod, '_clock', lambda: now[0])
+    with pth.tmp() as tmp:
+        p = tmp / 'foo'
+        with pth.stat_cache(ttl=1):
+            assert not p.exists
+            io.open(p, 'w').close()
+            assert not p.exists
+            now[0] = 2
+            assert p.exists
+
+
+def test_stat_many():
+    paths = [pth('tests', 'files', 'b.txt'), 'bogus-doesnt-exist', pth('tests', 'files', 'a')] * 3
+    for workers in [None, 2]:
+        result = pth.stat_many(paths, workers=workers, chunksize=2)
+        assert len(result) == 9
+        assert list(result.missing) == [0, 1, 0] * 3
+        assert list(result.size)[:2] == [1, 0]
+        assert result.errno[1] == errno.ENOENT
+        assert stat.S_ISDIR(result.mode[2])
+        assert result.inode[0] == os.stat('tests/files/b.txt').st_ino
+        assert result.mtime[0] == os.stat('tests/files/b.txt').st_mtime
+
+
+@mark.skipif(sys.platform == 'win32', reason="needs symlink privileges")
+def test_stat_many_nofollow():
+    with pth.tmp() as tmp:
+        os.symlink('bogus-doesnt-exist', tmp / 'link')
+        assert list(pth.stat_many([tmp / 'link']).missing) == [1]
+        assert list(pth.stat_many([tmp / 'link'], follow_symlinks=False).missing) == [0]
+
+
+def test_copy():
+    with pth.tmp() as tmp:
+        dest = pth.Path('tests/files/test.zip').copy(tmp)
+        assert dest == tmp / 'test.zip'
+        assert dest.strategy in ('reflink', 'copy_file_range', 'sendfile', 'userspace')
+        assert dest('rb').read() == pth.Path('tests/files/test.zip')('rb').read()
+        raises(shutil.Error, pth.Path(dest).copy, dest)
+
+
+@pytest.mark.parametrize('strategy', ['reflink', 'copy_file_range', 'sendfile', 'userspace'])
+def test_copy_strategy(strategy):
+    if pth.__mod.COPY_STRATEGIES[strategy] is None:
+        pytest.skip("%s not supported" % strategy)
+    with pth.tmp() as tmp:
+        src = tmp / 'src'
+        with src('wb') as fh:
+            fh.write(b'x' * 3000000)
+        try:
+            dest = src.copy(tmp / 'dest', strategy=strategy)
+        except EnvironmentError as exc:  # IOError from fcntl.ioctl on Python 2
+            pytest.skip("%s not supported by the filesystem: %s" % (strategy, exc))
+        assert dest.strategy == strategy
+        assert dest('rb').read() == b'x' * 3000000
+
+
+def test_copy_fallback():
+    with pth.tmp() as tmp:
+        src = tmp / 'src'
+        with src('w') as fh:
+            fh.write(u'foobar')
+        src.chmod(0o600)
+        dest = src.copy(tmp / 'dest', strategy=['reflink', 'userspace'], preserve=True)
+        assert dest.strategy in ('reflink', 'userspace')
+        assert dest('r').read() == 'foobar'
+        assert stat.S_IMODE(os.stat(dest).st_mode) == 0o600
+        raises(ValueError, src.copy, tmp / 'dest', strategy='bogus')
+
+
+def test_copy_fallback_ioerror(monkeypatch):
+    def reflink(src_fd, dest_fd):
+        raise IOError(errno.EOPNOTSUPP, os.strerror(errno.EOPNOTSUPP))  # what fcntl.ioctl raises on Python 2
+    monkeypatch.setitem(pth.__mod.COPY_STRATEGIES, 'reflink', reflink)
+    with pth.tmp() as tmp:
+        with (tmp / 'src')('w') as fh:
+            fh.write(u'foobar')
+        dest = (tmp / 'src').copy(tmp / 'dest', strategy=['reflink', 'userspace'])
+        assert dest.strategy == 'userspace'
+        assert dest('r').read() == 'foobar'
+
+
+def test_copy_not_regular():
+    with pth.tmp() as tmp:
+        (tmp / 'dir').mkdir()
+        exc = raises(OSError, (tmp / 'dir').copy, tmp / 'dest')
+        assert exc.value.errno == errno.EISDIR
+        assert not (tmp / 'dest').exists
+        if hasattr(os, 'mkfifo'):
+            os.mkfifo(tmp / 'fifo')
+            raises(shutil.SpecialFileError, (tmp / 'fifo').copy, tmp / 'dest')
+            assert not (tmp / 'dest').exists
+
+
+def test_copy_empty():
+    with pth.tmp() as tmp:
+        (tmp / 'empty')('w').close()
+        dest = (tmp / 'empty').copy(tmp / 'dest')
+        assert dest.size == 0
+        if pth.__mod.COPY_STRATEGIES['copy_file_range']:
+            # nothing to copy is fine when it's the only strategy
+            dest = (tmp / 'empty').copy(tmp / 'dest2', strategy='copy_file_range')
+            assert dest.strategy == 'copy_file_range'
+
+
+@mark.skipif("not os.path.exists('/proc/self/status')")
+def test_copy_procfs():
+    with pth.tmp() as tmp:
+        strategies = [name for name in ('copy_file_range', 'sendfile') if pth.__mod.COPY_STRATEGIES[name]]
+        dest = pth.Path('/proc/self/status').copy(tmp / 'status', strategy=strategies + ['userspace'])
+        assert dest.strategy == 'userspace'
+        assert dest.size > 0
+
+
+@pytest.mark.parametrize('workers', [None, 3])
+def test_copytree(workers):
+    with pth.tmp() as tmp:
+        dest = pth.Path('tests/files').copytree(tmp / 'files', workers=workers)
+        assert dest == tmp / 'files'
+        assert sorted(dest.tree) == [
+            tmp / 'files' / name for name in ['a', os.path.join('a', 'a.txt'), 'b.txt', 'test.zip']
+        ] + [tmp / 'files' / os.path.join('test.zip', name) for name in ['1', os.path.join('1', '1.txt'), 'B.TXT', 'a.txt']] + [
+            tmp / 'files' / 'trîcky-năme'
+        ]
+        assert (dest / 'test.zip' / 'a.txt')('r').read() == b'A'
+
+
+def test_copytree_filters():
+    with pth.tmp() as tmp:
+        dest = pth.Path('tests/files').copytree(tmp / 'files', include='*.txt', exclude=['a'])
+        assert sorted(dest.tree) == [tmp / 'files' / 'b.txt']
+        dest = pth.Path('tests/files').copytree(tmp / 'other', exclude=lambda path: path.name != 'a')
+        assert sorted(dest.tree) == [tmp / 'other' / 'a']
+
+
+def test_copytree_incremental():
+    with pth.tmp() as tmp:
+        dest = pth.Path('tests/files').copytree(tmp / 'files', incremental=True)
+        with (dest / 'b.txt')('w') as fh:
+            fh.write(u'X')
+        if PY33:
+            os.utime(dest / 'b.txt', ns=(0, os.stat('tests/files/b.txt').st_mtime_ns))
+        else:
+            os.utime(dest / 'b.txt', (0, os.stat('tests/files/b.txt').st_mtime))
+        with (dest / 'a' / 'a.txt')('w') as fh:
+            fh.write(u'X')
+        pth.Path('tests/files').copytree(dest, incremental=True, preserve=True)
+        assert (dest / 'b.txt')('r').read() == 'X'  # same size and mtime
+        assert (dest / 'a' / 'a.txt')('r').read() == pth.Path('tests/files/a/a.txt')('r').read()
+        assert os.stat(dest / 'a').st_mtime == os.stat('tests/files/a').st_mtime
+
+
+def _make_tree(root, depth=3, width=3):
+    for i in range(width):
+        with (root / ('file%s' % i))('w') as fh:
+            fh.write(u'x')
+        if depth:
+            (root / ('dir%s' % i)).mkdir()
+            _make_tree(root / ('dir%s' % i), depth - 1, width)
+
+
+@pytest.mark.parametrize('workers', [None, 4])
+def test_rmtree(workers):
+    with pth.tmp() as tmp:
+        root = tmp / 'root'
+        root.mkdir()
+        _make_tree(root)
+        if sys.platform != 'win32':
+            os.symlink(tmp, root / 'link')
+        root.rmtree(workers=workers)
+        assert not root.exists
+        assert tmp.exists
+
+
+def test_rmtree_onerror():
+    errors = []
+    with pth.tmp() as tmp:
+        raises(OSError, (tmp / 'missing').rmtree)
+        (tmp / 'missing').rmtree(onerror=lambda *args: errors.append(args[:2]))
+        assert errors and errors[-1][1] == tmp / 'missing'
+
+
+@mark.skipif("not pth.__mod._rmtree_fd_supported")
+@pytest.mark.parametrize('workers', [None, 2])
+def test_rmtree_symlink_swap(monkeypatch, workers):
+    errors = []
+    with pth.tmp() as tmp:
+        (tmp / 'root' / 'a' / 'b').makedirs()
+        (tmp / 'root' / 'a' / 'b' / 'file')('w').close()
+        (tmp / 'outside' / 'b').makedirs()
+        (tmp / 'outside' / 'b' / 'victim')('w').close()
+        real_scandir = pth.__mod.scandir
+
+        def scandir(fd):
+            entries = list(real_scandir(fd))
+            if [entry.name for entry in entries] == ['b'] and not (tmp / 'moved').exists:
+                # swap the directory being deleted for a symlink to somewhere else
+                os.rename(tmp / 'root' / 'a', tmp / 'moved')
+                os.symlink(tmp / 'outside', tmp / 'root' / 'a')
+            return iter(entries)
+        monkeypatch.setattr(pth.__mod, 'scandir', scandir)
+        (tmp / 'root').rmtree(workers=workers, onerror=lambda *args: errors.append(args[1]))
+        assert (tmp / 'outside' / 'b' / 'victim').exists
+        assert not (tmp / 'moved' / 'b').exists
+        assert errors
+
+
+def test_rmtree_background():
+    with pth.tmp() as tmp:
+        root = tmp / 'root'
+        root.mkdir()
+        _make_tree(root)
+        thread = root.rmtree(background=True, workers=2)
+        assert not root.exists
+        thread.join()
+        assert list(tmp.list) == []
+
+
+def test_tmp_rmtree():
+    with pth.tmp(rmtree_workers=2) as tmp:
+        _make_tree(tmp, depth=1)
+    assert not tmp.exists
+    with pth.tmp(rmtree_background=True) as tmp:
+        _make_tree(tmp, depth=1)
+    assert not tmp.exists
+
+
+def test_mmap():
+    mapping = pth.Path('tests/files/b.txt').mmap()
+    assert mapping[:] == pth.Path('tests/files/b.txt')('rb').read()
+    raises(TypeError, mapping.__setitem__, 0, b'x'[0])
+    raises(pth.PathMustBeFile, pth('tests').mmap)
+    with pth.tmp() as tmp:
+        dest = pth.Path('tests/files/b.txt').copy(tmp)
+        mapping = dest.mmap(access=mmap.ACCESS_WRITE)
+        mapping[0:1] = b'Z'
+        mapping.close()
+        assert dest('rb').read() == b'Z'
+
+
+def test_mmap_empty():
+    with pth.tmp() as tmp:
+        empty = tmp / 'empty.txt'
+        empty('wb').close()
+        assert empty.mmap().tobytes() == b''
+        assert len(empty.mmap(access=mmap.ACCESS_WRITE)) == 0
+
+
+def test_mmap_zip():
+    with pth.tmp() as tmp:
+        with zipfile.ZipFile(tmp / 'stored.zip', 'w') as zf:
+            zf.writestr('stored.txt', b'stored' * 100, zipfile.ZIP_STORED)
+            zf.writestr('deflated.txt', b'deflated' * 100, zipfile.ZIP_DEFLATED)
+            zf.writestr('empty.txt', b'', zipfile.ZIP_STORED)
+        zp = pth(tmp, 'stored.zip')
+        view = (zp / 'stored.txt').mmap()
+        assert view.readonly
+        if PY33:
+            assert isinstance(view.obj, mmap.mmap)
+        assert view.tobytes() == b'stored' * 100
+        assert (zp / 'deflated.txt').mmap().tobytes() == b'deflated' * 100
+        assert (zp / 'empty.txt').mmap().tobytes() == b''
+        raises(pth.PathMustBeFile, (zp / 'missing').mmap)
+        del view
+
+
+def test_read():
+    p = pth('tests', 'files', 'a', 'a.txt')
+    assert p.read_bytes() == p('rb').read()
+    assert p.read_text() == p('r').read()
+    assert pth('tests', 'files', 'trîcky-năme').read_text(encoding='latin-1') == pth('tests', 'files', 'trîcky-năme')('rb').read().decode('latin-1')
+    raises(pth.PathMustBeFile, pth('tests').read_bytes)
+
+
+def test_readinto():
+    with pth.tmp() as tmp:
+        p = tmp / 'data'
+        with p('wb') as fh:
+            fh.write(b'0123456789')
+        buf = bytearray(4)
+        assert p.readinto(buf) == 4
+        assert buf == b'0123'
+        assert p.readinto(buf, offset=8) == 2
+        assert buf == b'8923'
+        assert p.readinto(memoryview(buf)[1:], offset=5, length=2) == 2
+        assert buf == b'8563'
+        raises(TypeError, p.readinto, b'1234')
+        raises(pth.PathMustBeFile, tmp.readinto, buf)
+
+
+def test_read_zip():
+    with pth.tmp() as tmp:
+        with zipfile.ZipFile(tmp / 'test.zip', 'w') as zf:
+            zf.writestr('stored.txt', b'0123456789', zipfile.ZIP_STORED)
+            zf.writestr('deflated.txt', b'0123456789', zipfile.ZIP_DEFLATED)
+        zp = pth(tmp, 'test.zip')
+        for name in ['stored.txt', 'deflated.txt']:
+            member = zp / name
+            assert member.read_bytes() == b'0123456789'
+            assert member.read_text(encoding='ascii') == u'0123456789'
+            buf = bytearray(4)
+            assert member.readinto(buf) == 4
+            assert buf == b'0123'
+            assert member.readinto(buf, offset=8) == 2
+            assert buf == b'8923'
+            assert member.readinto(buf, offset=5, length=1) == 1
+            assert buf == b'5923'
+        raises(pth.PathMustBeFile, zp.read_bytes)
+
+
+def test_readinto_zip_deflated_large():
+    data = b''.join(hashlib.sha256(str(i).encode('ascii')).digest() * 64 for i in range(2048))
+    with pth.tmp() as tmp:
+        with zipfile.ZipFile(tmp / 'test.zip', 'w') as zf:
+            zf.writestr('big.bin', data, zipfile.ZIP_DEFLATED)
+        member = pth(tmp, 'test.zip') / 'big.bin'
+        buf = bytearray(len(data) + 10)
+        assert member.readinto(buf) == len(data)
+        assert buf[:len(data)] == data
+        for offset in [1, 1024 * 1024 - 3, len(data) - 5, len(data) + 1]:
+            buf = bytearray(1024 * 1024 + 7)
+            size = member.readinto(buf, offset=offset)
+            assert buf[:size] == data[offset:offset + len(buf)]
+
+
+def test_iter_chunks():
+    with pth.tmp() as tmp:
+        p = tmp / 'data'
+        with p('wb') as fh:
+            fh.write(b'0123456789')
+        assert list(p.iter_chunks(4)) == [b'0123', b'4567', b'89']
+        assert list(p.iter_chunks(4, offset=3)) == [b'3', b'4567', b'89']
+        assert list(p.iter_chunks(4, offset=3, length=6, readahead=True)) == [b'3', b'4567', b'8']
+        assert list(p.iter_chunks(4, length=0)) == []
+        raises(pth.PathMustBeFile, next, tmp.iter_chunks())
+
+
+def test_iter_lines():
+    with pth.tmp() as tmp:
+        p = tmp / 'data'
+        with p('wb') as fh:
+            fh.write(u'ă\nbb\n\nc'.encode('utf8'))
+        assert list(p.iter_lines(size=1)) == [u'ă\n'.encode('utf8'), b'bb\n', b'\n', b'c']
+        assert list(p.iter_lines(encoding='utf8', size=1)) == [u'ă\n', u'bb\n', u'\n', u'c']
+        assert list(p.iter_lines(encoding='utf8', keepends=False, size=3)) == [u'ă', u'bb', u'', u'c']
+        assert list(p.iter_lines(offset=3, length=3)) == [b'bb\n']
+
+
+def test_iter_lines_long():
+    data = b'x' * 10000 + b'\n\nyy\n' + b'z' * 5000
+    with pth.tmp() as tmp:
+        p = tmp / 'data'
+        with p('wb') as fh:
+            fh.write(data)
+        for size in [1, 7, 4096, 20000]:
+            assert list(p.iter_lines(size=size)) == data.splitlines(True)
+            assert list(p.iter_lines(encoding='ascii', keepends=False, size=size)) == data.decode('ascii').splitlines()
+
+
+def test_iter_zip():
+    with pth.tmp() as tmp:
+        with zipfile.ZipFile(tmp / 'test.zip', 'w') as zf:
+            zf.writestr('deflated.txt', b'01\n23456789', zipfile.ZIP_DEFLATED)
+        zp = pth(tmp, 'test.zip') / 'deflated.txt'
+        assert list(zp.iter_chunks(4)) == [b'01\n2', b'3456', b'789']
+        assert list(zp.iter_chunks(4, offset=3, length=5)) == [b'2345', b'6']
+        assert list(zp.iter_lines(size=2)) == [b'01\n', b'23456789']
+        assert list(zp.iter_lines(size=2, encoding='ascii', keepends=False)) == [u'01', u'23456789']
+        raises(pth.PathMustBeFile, next, pth(tmp, 'test.zip').iter_chunks())
+
+
+def _make_zip(path):
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('stored.txt', b'stored' * 1000, zipfile.ZIP_STORED)
+        zf.writestr('dir/deflated.txt', b'deflated' * 1000, zipfile.ZIP_DEFLATED)
+        # no bzip2 support in Python 2's zipfile
+        zf.writestr('dir/sub/bzip2.txt', b'bzip2' * 1000, getattr(zipfile, 'ZIP_BZIP2', zipfile.ZIP_DEFLATED))
+        zf.writestr('../evil.txt', b'evil', zipfile.ZIP_DEFLATED)
+        zf.writestr('empty/', b'')
+    return pth(path)
+
+
+@pytest.mark.parametrize('workers', [None, 3])
+def test_read_many(workers):
+    with pth.tmp() as tmp:
+        zp = _make_zip(tmp / 'test.zip')
+        assert zp.read_many(['stored.txt', zp / 'dir' / 'sub' / 'bzip2.txt'], workers=workers) == [
+            b'stored' * 1000, b'bzip2' * 1000
+        ]
+        assert (zp / 'dir').read_many(['deflated.txt'], workers=workers) == [b'deflated' * 1000]
+        assert sorted(zp.read_many(workers=workers)) == sorted([
+            b'stored' * 1000, b'deflated' * 1000, b'bzip2' * 1000, b'evil'
+        ])
+        raises(pth.PathMustBeFile, zp.read_many, ['dir'])
+
+
+@pytest.mark.parametrize('workers', [None, 3])
+def test_extract(workers):
+    with pth.tmp() as tmp:
+        zp = _make_zip(tmp / 'test.zip')
+        dest = zp.extract(tmp / 'out', workers=workers)
+        assert sorted(dest.tree) == [
+            dest / 'dir', dest / 'dir' / 'deflated.txt', dest / 'dir' / 'sub', dest / 'dir' / 'sub' / 'bzip2.txt',
+            dest / 'empty', dest / 'evil.txt', dest / 'stored.txt',
+        ]
+        assert (dest / 'dir' / 'sub' / 'bzip2.txt').read_bytes() == b'bzip2' * 1000
+        dest = (zp / 'dir').extract(tmp / 'sub', workers=workers)
+        assert sorted(dest.tree) == [dest / 'deflated.txt', dest / 'sub', dest / 'sub' / 'bzip2.txt']
+        dest = (zp / 'dir' / 'deflated.txt').extract(tmp / 'single', workers=workers)
+        assert list(dest.tree) == [dest / 'deflated.txt']
+        assert (dest / 'deflated.txt').read_bytes() == b'deflated' * 1000
+
+
+def test_hash():
+    p = pth('tests', 'files', 'b.txt')
+    assert p.hash() == hashlib.sha256(p.read_bytes()).hexdigest()
+    assert p.hash('md5') == hashlib.md5(p.read_bytes()).hexdigest()
+    raises(pth.PathMustBeFile, pth('tests').hash)
+
+
+def test_hash_zip():
+    zp = pth('tests', 'files', 'test.zip') / 'a.txt'
+    assert zp.hash() == hashlib.sha256(b'A').hexdigest()
+    assert zp.hash('crc32') == '%08x' % (zlib.crc32(b'A') & 0xffffffff)
+    raises(pth.PathMustBeFile, (pth('tests', 'files', 'test.zip') / '1').hash)
+
+
+def test_hash_cache(monkeypatch):
+    with pth.tmp() as tmp:
+        p = tmp / 'data'
+        with p('wb') as fh:
+            fh.write(b'foo')
+        with pth.HashCache(tmp / 'cache.json') as cache:
+            assert p.hash(cache=cache) == hashlib.sha256(b'foo').hexdigest()
+            assert len(cache) == 1
+        cache = pth.HashCache(tmp / 'cache.json', maxsize=1)
+        assert len(cache) == 1
+        monkeypatch.setattr(hashlib, 'new', None)
+        assert p.hash(cache=cache) == hashlib.sha256(b'foo').hexdigest()
+        monkeypatch.undo()
+        with p('wb') as fh:
+            fh.write(b'barbaz')
+        assert p.hash(cache=cache) == hashlib.sha256(b'barbaz').hexdigest()
+        assert len(cache) == 1
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_hash_many(workers):
+    paths = ['tests/files/b.txt', pth('tests', 'files', 'a', 'a.txt'), pth('tests', 'files', 'test.zip') / 'a.txt']
+    assert pth.hash_many(paths, workers=workers) == [
+        hashlib.sha256(pth.Path(path).read_bytes() if '.zip' not in path else b'A').hexdigest() for path in paths
+    ]
+
+
+@pytest.mark.parametrize('workers', [None, 2])
+def test_find_duplicates(workers):
+    with pth.tmp() as tmp:
+        (tmp / 'a').mkdir()
+        (tmp / 'b').mkdir()
+        for path, data in [
+            ('a/1', b'small'), ('b/1', b'small'), ('a/2', b'SMALL'),
+            ('a/big1', b'x' * 100 + b'y' * 100 + b'z' * 100), ('b/big1', b'x' * 100 + b'y' * 100 + b'z' * 100),
+            ('a/big2', b'x' * 100 + b'Y' * 100 + b'z' * 100),
+            ('a/empty', b''), ('b/empty', b''),
+            ('a/linked', b'linked'),
+        ]:
+            with (tmp / path)('wb') as fh:
+                fh.write(data)
+        os.link(tmp / 'a' / 'linked', tmp / 'b' / 'linked')
+        os.link(tmp / 'a' / '1', tmp / 'a' / '1-link')
+        assert pth.find_duplicates([tmp / 'a', tmp / 'b'], workers=workers, block_size=50) == [
+            [tmp / 'a' / '1', tmp / 'a' / '1-link', tmp / 'b' / '1'],
+            [tmp / 'a' / 'big1', tmp / 'b' / 'big1'],
+        ]
+        assert pth.find_duplicates(tmp, workers=workers, min_size=0) == [
+            [tmp / 'a' / '1', tmp / 'a' / '1-link', tmp / 'b' / '1'],
+            [tmp / 'a' / 'big1', tmp / 'b' / 'big1'],
+            [tmp / 'a' / 'empty', tmp / 'b' / 'empty'],
+        ]
+
+
+@pytest.mark.parametrize('workers', [None, 3])
+def test_disk_usage(workers):
+    with pth.tmp() as tmp:
+        root = tmp / 'root'
+        root.mkdir()
+        (root / 'a').mkdir()
+        (root / 'a' / 'b').mkdir()
+        for path, size in [('one', 10), ('a/two', 100), ('a/b/three', 1000)]:
+            with (root / path)('wb') as fh:
+                fh.write(b'x' * size)
+        os.link(root / 'a' / 'b' / 'three', root / 'a' / 'b' / 'three-link')
+        dirsize = os.stat(root).st_size
+        usage = root.disk_usage(apparent=True, workers=workers)
+        assert list(usage) == [root / 'a' / 'b', root / 'a', root]
+        assert usage[root / 'a' / 'b'] == 1000 + dirsize
+        assert usage[root / 'a'] == 1100 + 2 * dirsize
+        assert usage[root] == 1110 + 3 * dirsize
+        assert list(root.disk_usage(max_depth=1, workers=workers)) == [root / 'a', root]
+        assert root.disk_usage(workers=workers)[root] == sum(
+            os.stat(path).st_blocks * 512 for path in [root, root / 'a', root / 'a' / 'b', root / 'one', root / 'a' / 'two', root / 'a' / 'b' / 'three']
+        )
+        raises(pth.PathMustBeDirectory, (root / 'one').disk_usage)
+        for spelling in [root + '/', root + '/.']:
+            usage = pth.Path(spelling).disk_usage(apparent=True, workers=workers)
+            assert usage[spelling] == 1110 + 3 * dirsize
+            assert len(usage) == 3
+
+
+def test_disk_usage_zip():
+    zp = pth('tests', 'files', 'test.zip')
+    infos = dict((zi.filename, zi) for zi in zipfile.ZipFile(zp).infolist())
+    usage = zp.disk_usage()
+    assert list(usage) == [zp / '1', zp]
+    assert usage[zp / '1'] == infos['1/1.txt'].compress_size
+    assert usage[zp] == sum(zi.compress_size for zi in infos.values())
+    assert zp.disk_usage(apparent=True)[zp] == sum(zi.file_size for zi in infos.values())
+    assert list(zp.disk_usage(max_depth=0)) == [zp]
+    assert list((zp / '1').disk_usage()) == [zp / '1']
+    assert zp.disk_usage(workers=2) == usage
+    raises(pth.PathMustBeDirectory, (zp / 'a.txt').disk_usage)
+
+
+def test_glob():
+    files = pth('tests', 'files')
+    assert sorted(files.glob('*.txt')) == [files / 'b.txt']
+    assert sorted(files.glob('*')) == sorted(files.list)
+    assert sorted(files.glob('[ab]*')) == [files / 'a', files / 'b.txt']
+    assert sorted(files.glob('a/*.txt')) == [files / 'a' / 'a.txt']
+    assert sorted(files.glob('{a/a,b}.txt')) == [files / 'a' / 'a.txt', files / 'b.txt']
+    assert sorted(files.glob('**/*.txt')) == [files / 'a' / 'a.txt', files / 'b.txt']
+    assert sorted(files.rglob('*.txt')) == [files / 'a' / 'a.txt', files / 'b.txt']
+    assert sorted(files.glob('**')) == sorted(p for p in files.tree if not isinstance(p, pth.ZipPath) or p == files / 'test.zip')
+    assert sorted(files.glob('b.txt')) == [files / 'b.txt']
+    assert list(files.glob('missing/*')) == []
+    assert list(files.glob('b.txt/*')) == []
+    assert isinstance(next(files.glob('test.*')), pth.ZipPath)
+
+
+def test_glob_hidden():
+    with pth.tmp() as tmp:
+        for name in ['.hidden', 'visible']:
+            (tmp / name).mkdir()
+            (tmp / name / 'file')('w').close()
+        assert sorted(tmp.glob('*/file')) == [tmp / 'visible' / 'file']
+        assert sorted(tmp.glob('.*/file')) == [tmp / '.hidden' / 'file']
+        assert sorted(tmp.glob('.hidden/file')) == [tmp / '.hidden' / 'file']
+        assert sorted(tmp.rglob('file')) == [tmp / 'visible' / 'file']
+
+
+def test_glob_zip():
+    zp = pth('tests', 'files', 'test.zip')
+    assert sorted(zp.glob('*.txt')) == [zp / 'a.txt']
+    assert sorted(zp.glob('*.[tT][xX][tT]')) == [zp / 'B.TXT', zp / 'a.txt']
+    assert sorted(zp.rglob('*.txt')) == [zp / '1' / '1.txt', zp / 'a.txt']
+    assert sorted(zp.glob('1/{1,2}.txt')) == [zp / '1' / '1.txt']
+    assert sorted((zp / '1').glob('*')) == [zp / '1' / '1.txt']
+    assert all(isinstance(p, pth.ZipPath) for p in zp.rglob('*'))
+    assert list(zp.glob('missing/*')) == []
+
+
+def test_glob_pattern():
+    pattern = pth.GlobPattern('{a,b}/**/**/x{1,2}')
+    assert repr(pattern) == "pth.GlobPattern('{a,b}/**/**/x{1,2}')"
+    assert len(pattern.alternatives) == 4
+    assert all(len(segments) == 3 for segments in pattern.alternatives)
+
+
+def test_glob_duplicates():
+    with pth.tmp() as tmp:
+        (tmp / 'a' / 'a' / 'a').makedirs()
+        (tmp / 'a' / 'a' / 'a' / 'b')('w').close()
+        for pattern in ['**/a/**/b', '{a,a/a}/**/b', '**/a/*/b', '**/b']:
+            matches = list(tmp.glob(pattern))
+            assert len(matches) == len(set(matches))
+        assert list(tmp.glob('**/a/**/b')) == [tmp / 'a' / 'a' / 'a' / 'b']
+        assert sorted(tmp.glob('**/a/*/b')) == [tmp / 'a' / 'a' / 'a' / 'b']
+
+
+def test_search():
+    with pth.tmp() as tmp:
+        for name in ['node_modules/pkg', '.git/objects', 'src/sub']:
+            (tmp / name).makedirs()
+        for name, data in [('a.py', u'x'), ('node_modules/pkg/b.py', u'x'), ('.git/objects/c', u'xx'),
+                           ('src/d.py', u'xxxx'), ('src/sub/e.txt', u'xxxxxxxx')]:
+            with (tmp / name)('w') as fh:
+                fh.write(data)
+        old = tmp / 'src' / 'd.py'
+        os.utime(old, (1000000000, 1000000000))
+
+        assert sorted(tmp.search(ext='.py', prune=['node_modules', '.git'])) == [tmp / 'a.py', tmp / 'src' / 'd.py']
+        assert sorted(tmp.search(type='d', prune='node_modules')) == [
+            tmp / '.git', tmp / '.git' / 'objects', tmp / 'src', tmp / 'src' / 'sub']
+        assert sorted(tmp.search(type='file', max_depth=1, prune='.git')) == [tmp / 'a.py', tmp / 'src' / 'd.py']
+        assert sorted(tmp.search(name='*.txt')) == [tmp / 'src' / 'sub' / 'e.txt']
+        assert sorted(tmp.search(min_size=2, type='f')) == [
+            tmp / '.git' / 'objects' / 'c', tmp / 'src' / 'd.py', tmp / 'src' / 'sub' / 'e.txt']
+        assert sorted(tmp.search(ext=('.py', '.txt'), newer_than=old, prune=lambda entry: entry.name == 'node_modules')) == [
+            tmp / 'a.py', tmp / 'src' / 'sub' / 'e.txt']
+        assert sorted(tmp.search(ext='.py', newer_than=2000000000)) == []
+        assert sorted(tmp.search(max_depth=0)) == sorted(tmp.list)
+        raises(ValueError, list, tmp.search(type='socket'))
+
+
+def test_search_links():
+    with pth.tmp() as tmp:
+        (tmp / 'dir').mkdir()
+        (tmp / 'dir' / 'file')('w').close()
+        os.symlink('dir', tmp / 'link')
+        assert list(tmp.search(type='l')) == [tmp / 'link']
+        assert sorted(tmp.search(type='f')) == [tmp / 'dir' / 'file']
+
+
+def test_find_str():
+    assert pth('abc/def').find('/') == 3
+    assert pth('abc/def').find('x', 1) == -1
+    assert pth('tests').find('*.py') == -1
+    raises(TypeError, pth('tests').find, name='*.py')
+
+
+@pytest.mark.parametrize('backend', [
+    'poll',
+    pytest.param('inotify', marks=mark.skipif(not pth.__mod._InotifyBackend.available(), reason='no inotify')),
+])
+def test_watch(backend):
+    with pth.tmp() as tmp:
+        (tmp / 'old')('w').close()
+        (tmp / 'gone')('w').close()
+        with tmp.watch(backend=backend, debounce=0.05, interval=0.05) as watcher:
+            assert watcher.read(0.01) == []
+            with (tmp / 'old')('a') as fh:
+                fh.write(u'more')
+            (tmp / 'gone').unlink()
+            (tmp / 'new')('w').close()
+            (tmp / 'sub').mkdir()
+            events = []
+            for _ in range(10):
+                events.extend(watcher.read(1))
+                if len(events) >= 4:
+                    break
+            assert sorted(events) == [
+                ('created', tmp / 'new', None),
+                ('created', tmp / 'sub', None),
+                ('deleted', tmp / 'gone', None),
+                ('modified', tmp / 'old', None),
+            ]
+
+            (tmp / 'sub' / 'deep')('w').close()
+            assert watcher.read(5) == [('created', tmp / 'sub' / 'deep', None)]
+
+            (tmp / 'new').rename(tmp / 'renamed')
+            assert watcher.read(5) == [('moved', tmp / 'new', tmp / 'renamed')]
+        assert watcher.read() is None
+        assert list(watcher) == []
+
+
+@mark.skipif(not pth.__mod._InotifyBackend.available(), reason='no inotify')
+def test_watch_close_while_reading():
+    with pth.tmp() as tmp:
+        watcher = tmp.watch(backend='inotify')
+        backend = watcher.backend
+        results = []
+        reader = threading.Thread(target=lambda: results.append(watcher.read()))
+        reader.start()
+        for _ in range(100):
+            if backend.polling:
+                break
+            time.sleep(0.01)
+        assert backend.polling
+        watcher.close()
+        reader.join(5)
+        assert results == [None]
+        raises(OSError, os.fstat, backend.fd)
+        assert watcher.read() is None
+
+
+@mark.skipif(not pth.__mod._InotifyBackend.available(), reason='no inotify')
+def test_watch_inotify_moved_before_watched():
+    with pth.tmp() as tmp:
+        with tmp.watch(backend='inotify', debounce=0.05) as watcher:
+            (tmp / 'x' / 'y').makedirs()
+            (tmp / 'x').rename(tmp / 'z')
+            events = []
+            for _ in range(10):
+                events.extend(watcher.read(1))
+                if ('created', tmp / 'z' / 'y', None) in events:
+                    break
+            assert sorted(events) == [('created', tmp / 'z', None), ('created', tmp / 'z' / 'y', None)]
+            (tmp / 'z' / 'y' / 'file')('w').close()
+            assert watcher.read(5) == [('created', tmp / 'z' / 'y' / 'file', None)]
+
+
+@mark.skipif(not pth.__mod._InotifyBackend.available() or not os.path.isdir('/proc/self/fd'), reason='no inotify')
+def test_watch_inotify_missing_root():
+    backend = pth.__mod._InotifyBackend
+    with pth.tmp() as tmp:
+        fds = len(os.listdir('/proc/self/fd'))
+        for _ in range(3):
+            raises(OSError, backend, str(tmp / 'missing'), True)
+        assert len(os.listdir('/proc/self/fd')) == fds
+
+
+def test_watch_coalesce():
+    coalesce = pth.__mod._coalesce
+    assert coalesce([('created', 'a', None), ('modified', 'a', None)]) == [('created', 'a', None)]
+    assert coalesce([('created', 'a', None), ('deleted', 'a', None)]) == []
+    assert coalesce([('deleted', 'a', None), ('created', 'a', None)]) == [('modified', 'a', None)]
+    assert coalesce([('modified', 'a', None), ('deleted', 'a', None)]) == [('deleted', 'a', None)]
+    assert coalesce([('created', 'a', None), ('moved', 'a', 'b')]) == [('created', 'b', None)]
+    assert coalesce([('modified', 'a', None), ('moved', 'a', 'b')]) == [('moved', 'a', 'b')]
+    a_b, c_b = os.path.join('a', 'b'), os.path.join('c', 'b')
+    assert coalesce([('created', 'a', None), ('created', a_b, None), ('moved', 'a', 'c')]) == [
+        ('created', 'c', None), ('created', c_b, None)]
+    assert coalesce([('modified', a_b, None), ('moved', 'a', 'c')]) == [('moved', 'a', 'c'), ('modified', c_b, None)]
+    assert coalesce([('deleted', a_b, None), ('moved', 'a', 'c')]) == [('deleted', a_b, None), ('moved', 'a', 'c')]
+    assert pth.WatchEvent.__doc__.strip().startswith('A filesystem change')
+
+
+def test_watch_filter_and_iter():
+    with pth.tmp() as tmp:
+        watcher = tmp.watch(backend='poll', events='created', debounce=0.01, interval=0.01)
+        (tmp / 'file')('w').close()
+        (tmp / 'file').unlink()
+        (tmp / 'other')('w').close()
+        assert next(watcher) == ('created', tmp / 'other', None)
+        assert repr(watcher) == 'pth.Watcher(%r, backend=%r)' % (str(tmp), '_PollBackend')
+        watcher.close()
+        raises(ValueError, tmp.watch, backend='kqueue')
+
+
+@mark.skipif("sys.version_info < (3, 5)")
+def test_watch_async():
+    import asyncio
+    with pth.tmp() as tmp:
+        watcher = tmp.watch(backend='poll', debounce=0.01, interval=0.01)
+        (tmp / 'file')('w').close()
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            iterator = watcher.__aiter__()
+            assert loop.run_until_complete(iterator.__anext__()) == ('created', tmp / 'file', None)
+            watcher.close()
+            raises(StopAsyncIteration, loop.run_until_complete, iterator.__anext__())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+def test_snapshot():
+    with pth.tmp() as tmp:
+        (tmp / 'dir' / 'sub').makedirs()
+        for name, data in [('a', u'a'), ('dir/b', u'bb'), ('dir/sub/c', u'ccc'), ('d', u'd')]:
+            with (tmp / name)('w') as fh:
+                fh.write(data)
+        old = tmp.snapshot(algo='md5')
+        assert old.paths == ['a', 'd', 'dir', 'dir/b', 'dir/sub', 'dir/sub/c']
+        assert list(old.isdir) == [0, 0, 1, 0, 1, 0]
+        assert list(old.size)[:2] == [1, 1]
+        assert old.hashes[0] == hashlib.md5(b'a').hexdigest()
+        assert old.hashes[2] is None
+        assert 'dir/b' in old
+        assert old['dir/sub/c'][:2] == (False, 3)
+        assert repr(old) == 'pth.Snapshot(%r, 6 entries)' % str(tmp)
+
+        with (tmp / 'a')('w') as fh:
+            fh.write(u'changed')
+        (tmp / 'd').unlink()
+        (tmp / 'dir' / 'b').rename(tmp / 'dir' / 'sub' / 'b2')
+        (tmp / 'e')('w').close()
+        new = tmp.snapshot(previous=old, algo='md5')
+        assert new.diff(new) == ((set(), set(), set(), set()))
+        diff = old.diff(new)
+        assert diff.added == {'e'}
+        assert diff.removed == {'d'}
+        assert diff.modified == {'a'}
+        assert diff.renamed == {('dir/b', 'dir/sub/b2')}
+        assert new.hashes == tmp.snapshot(algo='md5').hashes
+
+
+def test_snapshot_reuses_listings():
+    with pth.tmp() as tmp:
+        (tmp / 'dir').mkdir()
+        (tmp / 'dir' / 'file')('w').close()
+        # whole seconds, so they're set exactly on Python 2 too
+        os.utime(tmp / 'dir', (1000000000, 1000000000))
+        old = tmp.snapshot()
+        # a listing is reused while the directory's mtime is unchanged, even if it's stale
+        (tmp / 'dir' / 'new')('w').close()
+        os.utime(tmp / 'dir', (1000000000, 1000000000))
+        assert 'dir/new' not in tmp.snapshot(previous=old)
+        os.utime(tmp / 'dir', (1000000000, 1000000001))
+        assert 'dir/new' in tmp.snapshot(previous=old)
+
+
+def test_snapshot_save_load():
+    with pth.tmp() as tmp:
+        (tmp / 'dir').mkdir()
+        with (tmp / 'dir' / 'file')('w') as fh:
+            fh.write(u'x')
+        os.symlink('dir', tmp / 'link')
+        for algo in [None, 'sha1']:
+            snapshot = tmp.snapshot(algo=algo)
+            snapshot.save(tmp / 'snap')
+            loaded = pth.Snapshot.load(tmp / 'snap')
+            assert loaded.root == snapshot.root
+            assert loaded.algo == algo
+            assert loaded.root_mtime_ns == snapshot.root_mtime_ns
+            assert loaded.paths == snapshot.paths == ['dir', 'dir/file', 'link'] + (['snap'] if algo else [])
+            assert loaded.hashes == snapshot.hashes
+            if algo:
+                assert len(loaded.hashes.data) == 20 * len(loaded)
+                assert loaded.hashes[0] is None
+                assert loaded.hashes[1] == loaded.hashes[-3] == hashlib.sha1(b'x').hexdigest()
+                assert list(loaded.hashes) == list(snapshot.hashes)
+                raises(IndexError, loaded.hashes.__getitem__, len(loaded))
+            for column in 'isdir', 'size', 'mtime_ns', 'inode':
+                assert getattr(loaded, column) == getattr(snapshot, column)
+        empty = pth.Snapshot(str(tmp))
+        empty.save(tmp / 'empty')
+        assert pth.Snapshot.load(tmp / 'empty').paths == []
+        raises(ValueError, pth.Snapshot.load, tmp / 'dir' / 'file')
+
+
+def _run_async(*futures):
+    import asyncio
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(asyncio.gather(*[
+            future() if callable(future) else future for future in futures
+        ]))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def _drain_async(iterator):
+    import asyncio
+    items = []
+    while True:
+        try:
+            items.append(asyncio.get_event_loop().run_until_complete(iterator.__anext__()))
+        except StopAsyncIteration:
+            return items
+
+
+@mark.skipif("sys.version_info < (3, 5)")
+def test_aio_metadata():
+    calls = []
+    aio = pth.AIO(max_workers=2)
+
+    import asyncio
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    real_run_in_executor = loop.run_in_executor
+
+    def run_in_executor(executor, func, *args):
+        calls.append(func)
+        return real_run_in_executor(executor, func, *args)
+    loop.run_in_executor = run_in_executor
+    try:
+        path = aio('tests', 'files', 'b.txt')
+        assert repr(path) == "pth.AsyncPath('tests/files/b.txt')"
+        results = loop.run_until_complete(asyncio.gather(
+            path.exists(), path.isfile(), path.size(), aio('tests', 'files').isdir(), aio('missing').size(),
+            return_exceptions=True
+        ))
+        assert results[:4] == [True, True, os.path.getsize('tests/files/b.txt'), True]
+        assert isinstance(results[4], OSError)
+        assert len(calls) == 1
+
+        assert loop.run_until_complete(path.stat()).st_size == results[2]
+        assert loop.run_until_complete(path.metadata('isdir', 'size')) == {'isdir': False, 'size': results[2]}
+        raises(ValueError, path.metadata, 'read_bytes')
+        assert len(loop.run_until_complete(aio.stat_many(['tests/files/b.txt', 'missing'])).missing) == 2
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+@mark.skipif("sys.version_info < (3, 5)")
+def test_aio_calls_and_iterators():
+    aio = pth.AIO(max_workers=2)
+    with pth.tmp() as tmp:
+        with (tmp / 'file')('w') as fh:
+            fh.write('line1\nline2\n')
+        path = tmp.a
+        assert isinstance(path, pth.AsyncPath)
+        (copy,) = _run_async(lambda: aio(tmp / 'file').copy(tmp / 'copy'))
+        assert copy == tmp / 'copy'
+        (tmp / 'dir').mkdir()
+        text, listing, files, dirs = _run_async(
+            lambda: copy.a.read_text(), lambda: aio(tmp).list(), lambda: aio(tmp).files(), lambda: aio(tmp).dirs()
+        )
+        assert text == 'line1\nline2\n'
+        assert sorted(listing) == [tmp / 'copy', tmp / 'dir', tmp / 'file']
+        assert sorted(files) == [tmp / 'copy', tmp / 'file']
+        assert dirs == [tmp / 'dir']
+        raises(AttributeError, getattr, path, 'missing')
+        raises(AttributeError, getattr, path, '_private')
+
+        import asyncio
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            assert sorted(_drain_async(path.tree())) == sorted(tmp.tree)
+            assert _drain_async(aio(tmp / 'file').iter_lines(encoding='ascii')) == ['line1\n', 'line2\n']
+            assert _drain_async(aio(tmp / 'file').iter_chunks(size=4)) == [b'line', b'1\nli', b'ne2\n']
+            assert _drain_async(path.search(name='c*')) == [tmp / 'copy']
+            iterator = path.glob('missing/*')
+            raises(StopAsyncIteration, loop.run_until_complete, iterator.__anext__())
+
+            closed = []
+
+            def numbers():
+                try:
+                    for i in range(1000):
+                        yield i
+                finally:
+                    closed.append(True)
+            iterator = pth.__mod._AsyncIterator(aio, numbers, 2)
+            assert loop.run_until_complete(iterator.__anext__()) == 0
+            loop.run_until_complete(iterator.aclose())
+            assert closed == [True]
+            raises(StopAsyncIteration, loop.run_until_complete, iterator.__anext__())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+    aio.configure(max_workers=1)
+    assert aio.executor._max_workers == 1
+
+
+@mark.skipif("sys.version_info < (3, 5)")
+def test_aio_zip():
+    zp = pth('tests', 'files', 'test.zip')
+    assert _run_async(
+        lambda: (zp / 'a.txt').a.exists(), lambda: (zp / '1').a.isdir(), lambda: (zp / 'a.txt').a.read_bytes()
+    ) == [True, True, (zp / 'a.txt').read_bytes()]
+
+
+@mark.skipif("not hasattr(os, 'fwalk')")
+def test_opendir():
+    with pth.tmp() as tmp:
+        with tmp.opendir() as handle:
+            assert repr(handle) == 'pth.DirHandle(%r, fd=%s)' % (str(tmp), handle.fileno())
+            handle.mkdir('sub')
+            with handle.open('file', 'w') as fh:
+                fh.write('data')
+            with handle.open('file') as fh:
+                assert fh.read() == 'data'
+            assert sorted(handle.list()) == ['file', 'sub']
+            assert sorted(entry.name for entry in handle.scandir()) == ['file', 'sub']
+            assert handle.stat('file').st_size == 4
+            assert handle.exists('file')
+            assert not handle.exists('missing')
+            handle.chmod('file', 0o600)
+            assert stat.S_IMODE(handle.stat('file').st_mode) == 0o600
+
+            with handle.opendir('sub') as sub:
+                assert sub.path == tmp / 'sub'
+                handle.rename('file', 'moved', dest_dir=sub)
+                assert sub.list() == ['moved']
+                # the handle keeps working after the directory is renamed
+                handle.rename('sub', 'renamed')
+                sub.mkdir('deep')
+                assert (tmp / 'renamed' / 'deep').isdir
+            raises(OSError, handle.opendir, 'missing')
+
+            assert sorted(handle.tree) == [tmp / 'renamed', tmp / 'renamed' / 'deep', tmp / 'renamed' / 'moved']
+            assert [(relpath, sorted(dirs), files) for relpath, dirs, files, _ in handle.walk()] == [
+                ('', ['renamed'], []), ('renamed', ['deep'], ['moved']), ('renamed/deep', [], [])]
+
+            os.symlink(str(tmp / 'renamed' / 'deep'), tmp / 'renamed' / 'link')
+            handle.rmtree('renamed')
+            assert handle.list() == []
+            handle.open('gone', 'w').close()
+            handle.unlink('gone')
+            handle.mkdir('gone')
+            handle.rmdir('gone')
+            assert handle.list() == []
+        assert handle.fd is None
+        handle.close()
+
+
+@mark.skipif("not hasattr(os, 'fwalk')")
+def test_opendir_rmtree_nested():
+    with pth.tmp() as tmp:
+        for name in ['sub/deeper/x', 'deeper/y', 'other/z']:
+            (tmp / name).makedirs()
+        os.symlink(str(tmp / 'other'), tmp / 'link')
+        with tmp.opendir() as handle:
+            handle.rmtree(os.path.join('sub', 'deeper'))
+            assert not (tmp / 'sub' / 'deeper').exists
+            assert (tmp / 'sub').isdir
+            assert (tmp / 'deeper' / 'y').isdir
+            handle.rmtree('deeper' + os.sep)
+            assert not (tmp / 'deeper').exists
+            raises(OSError, handle.rmtree, os.path.join('link', 'z'))
+            raises(OSError, handle.rmtree, 'link')
+            assert (tmp / 'other' / 'z').isdir
+            for name in ['', os.sep, os.curdir, str(tmp / 'sub')]:
+                raises(ValueError, handle.rmtree, name)
+            assert sorted(handle.list()) == ['link', 'other', 'sub']
+
+
+def test_lcd():
+    cwd = os.getcwd()
+    with pth.tmp() as tmp:
+        (tmp / 'a' / 'b').makedirs()
+        with tmp.lcd() as local:
+            assert local == tmp
+            assert pth.cwd == tmp
+            assert pth('a') == 'a'
+            assert pth('a').abspath == tmp / 'a'
+            assert pth().abspath == tmp
+            assert pth('a').isdir
+            assert pth('/abs') == '/abs'
+            assert pth.Path('a').abspath == tmp / 'a'
+            with pth('a').lcd():
+                with pth.lwd('b') as nested:
+                    assert nested == tmp / 'a' / 'b'
+                    assert pth('x').abspath == tmp / 'a' / 'b' / 'x'
+                assert pth.cwd == tmp / 'a'
+            assert pth.cwd == tmp
+            raises(pth.PathMustBeDirectory, pth.lwd('missing').__enter__)
+            assert os.getcwd() == cwd
+        assert pth.cwd == cwd
+        assert pth('a') == 'a'
+        assert pth('a').abspath == os.path.join(cwd, 'a')
+
+
+def test_lcd_lexical():
+    with pth.tmp() as tmp:
+        (tmp / 'a' / 'b').makedirs()
+        with (tmp / 'a' / 'b' / 'file')('w') as fh:
+            fh.write(u'data')
+        with tmp.lcd():
+            path = pth('a', 'b', 'file')
+            assert path == os.path.join('a', 'b', 'file')
+            assert path.name == 'file'
+            assert path.dirname == os.path.join('a', 'b')
+            assert path.splitpath == (os.path.join('a', 'b'), 'file')
+            assert path.parts == ['a', 'b', 'file']
+            assert path.parents == [os.path.join('a', 'b'), 'a']
+            assert path.relpath('a') == os.path.join('b', 'file')
+            assert path.relpath(tmp) == path
+            assert (pth('a') / 'b' / 'file').read_text() == 'data'
+            assert path.dirname.isdir
+        # made inside the block, the path still resolves against it
+        assert path == os.path.join('a', 'b', 'file')
+        assert path.abspath == tmp / 'a' / 'b' / 'file'
+        assert path.read_text() == 'data'
+        assert path.dirname.abspath == tmp / 'a' / 'b'
+        assert sorted(path.dirname.list) == [tmp / 'a' / 'b' / 'file']
+        path.copy(pth(tmp, 'copy'))
+        assert (tmp / 'copy').read_text() == 'data'
+
+
+def test_lcd_arguments():
+    cwd = os.listdir('.')
+    with pth.tmp() as tmp:
+        with (tmp / 'f')('w') as fh:
+            fh.write(u'data')
+        with pth.lwd(tmp):
+            # plain relative strings given to the methods resolve against the local directory too
+            assert pth('f').copy('g') == tmp / 'g'
+            assert pth('f').samefile('f')
+            assert pth('g').rename('h') == tmp / 'h'
+            pth('h').renames('i')
+            pth('i').symlink('j')
+            assert os.readlink(str(tmp / 'j')) == 'i'
+            pth('a').mkdir()
+            pth('a').copytree('b')
+        assert sorted(tmp.list) == [tmp / name for name in ('a', 'b', 'f', 'i', 'j')]
+        with tmp.lcd():
+            path = pth('f')
+        # after the block too
+        assert path.relpath('a') == os.path.join('..', 'f')
+        path.rename('k')
+        assert (tmp / 'k').isfile
+    assert os.listdir('.') == cwd
+
+
+def test_lcd_threads():
+    import threading
+    seen = {}
+    barrier = threading.Barrier(2) if hasattr(threading, 'Barrier') else None
+    with pth.tmp() as tmp:
+        for name in 'ab':
+            (tmp / name).mkdir()
+
+        def worker(name):
+            with (tmp / name).lcd():
+                if barrier:
+                    barrier.wait()
+                seen[name] = pth('file')
+
+        threads = [threading.Thread(target=worker, args=(name,)) for name in 'ab']
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert seen == {'a': 'file', 'b': 'file'}
+        assert dict((name, path.abspath) for name, path in seen.items()) == {'a': tmp / 'a' / 'file', 'b': tmp / 'b' / 'file'}
+        assert pth.cwd == os.getcwd()
+
+
+@mark.skipif("not hasattr(os, 'fwalk')")
+def test_lcd_opendir():
+    with pth.tmp() as tmp:
+        assert pth.cwd_handle is None
+        with tmp.lcd(opendir=True):
+            handle = pth.cwd_handle
+            assert handle.path == tmp
+            handle.mkdir('made')
+            assert pth('made').isdir
+        assert handle.fd is None
+        assert pth.cwd_handle is None
+        assert repr(pth.lwd(tmp)) == 'pth.LocalWorkingDir(%r)' % str(tmp)